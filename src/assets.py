@@ -20,9 +20,15 @@
 import os
 import logging
 
+from multiprocessing.pool import ThreadPool
+
 import pygame
 
 from sdl import AssetManager
+from atlas import ATLAS_DIR, load_manifest
+from cache import SpriteCache
+from pack import PACK_NAME, AssetPack
+from watcher import watch as watch_directory
 
 __all__ = ['QAssets']
 
@@ -33,8 +39,33 @@ logger.addHandler(logging.NullHandler())
 
 
 class QAssets(AssetManager):
+    """QAssets(color_key[, asset_dir[, use_atlas[, budget[, workers[,
+    use_pack[, watch]]]]]]) -> an asset manager
+
+    Loads sprites from the `sprites` directory of asset_dir.
+
+    When a sprite pack was written (see pack.py) and use_pack is True, sprites
+    in it are made straight from the memory-mapped pack, unless a sprite file
+    is newer than the pack. Otherwise, when an
+    atlas was built (see atlas.py) and use_atlas is True, sprites found in its
+    manifest are served as subsurfaces of the atlas pages. Loading with
+    no_cache always goes to the separate files.
+
+    Loaded sprites are kept in a least recently used cache limited to budget
+    bytes (None, the default, means no limit). Atlas pages are shared by many
+    sprites and always stay loaded. Sprites cut out of them take no memory of
+    their own, so the pages are what the budget is charged for, as pinned
+    entries.
+
+    Preloading decodes images on up to `workers` threads.
 
-    def __init__(self, color_key, asset_dir=None):
+    With watch set, the sprite files are watched for changes and the changed
+    ones that are cached get reloaded by reload_changed. From then on those
+    sprites always come from their files, rather than the pack or atlas.
+    """
+
+    def __init__(self, color_key, asset_dir=None, use_atlas=True,
+                 budget=None, workers=4, use_pack=True, watch=False):
 
         if not isinstance(asset_dir, basestring):
             asset_dir = os.getenv('QUANTEE_ASSETS', './assets')
@@ -43,28 +74,331 @@ class QAssets(AssetManager):
 
         self.__asset_dir = os.path.abspath(asset_dir)
 
-        self.__sprites = {}
+        self.__sprites = SpriteCache(budget)
+
+        # Sprites changed on disk, whose pack and atlas copies are stale
+        self.__reloaded = set()
+
+        self.__manifest = None
+        self.__pages = {}
+
+        self.__workers = workers
+
+        self.__pack = None
+
+        pack_path = os.path.join(self.__asset_dir, PACK_NAME)
+
+        if use_pack and os.path.isfile(pack_path):
+
+            if self.__newer_sprites(os.path.getmtime(pack_path)):
+
+                logger.warning("Sprite pack %s is older than the sprites, "
+                               "loading them from their files", pack_path)
+
+            else:
+
+                self.__pack = AssetPack(pack_path)
+
+        self.__watcher = None
+
+        if watch:
+
+            self.__watcher = watch_directory(
+                os.path.join(self.__asset_dir, 'sprites'))
+
+        if use_atlas:
+
+            self.__manifest = load_manifest(self.__asset_dir)
+
+        if self.__manifest is not None:
+
+            logger.info("Atlas with %d sprites found",
+                        len(self.__manifest['sprites']))
+
+    def __newer_sprites(self, mtime):
+
+        sprite_dir = os.path.join(self.__asset_dir, 'sprites')
+
+        return any(
+            os.path.getmtime(os.path.join(sprite_dir, file_name)) > mtime
+            for file_name in os.listdir(sprite_dir)
+            if file_name.endswith('.png'))
+
+    def __sprite_path(self, name):
+
+        return os.path.join(self.__asset_dir, 'sprites', name + '.png')
+
+    def __page_path(self, i):
+
+        return os.path.join(self.__asset_dir,
+                            ATLAS_DIR,
+                            self.__manifest['pages'][i])
+
+    def __prepare(self, image):
+
+        # Has to run on the main thread
+        image.set_colorkey(self.__color_key)
+
+        return image.convert()
+
+    def __load_image(self, path):
+
+        return self.__prepare(pygame.image.load(path))
+
+    def __load_page(self, i):
+
+        if i not in self.__pages:
+
+            self.__keep_page(i, self.__load_image(self.__page_path(i)))
+
+            logger.info("Atlas page %d loaded", i)
+
+        return self.__pages[i]
+
+    def __keep_page(self, i, page):
+
+        self.__pages[i] = page
+
+        # Keyed apart from the sprite names
+        self.__sprites.pin((ATLAS_DIR, i))
+        self.__sprites.put((ATLAS_DIR, i), page)
+
+    def __cut(self, name):
+
+        i, x, y, w, h = self.__manifest['sprites'][name]
+
+        return self.__load_page(i).subsurface((x, y, w, h))
+
+    def __in_pack(self, name):
+
+        return (self.__pack is not None and
+                name in self.__pack and
+                name not in self.__reloaded)
+
+    def __in_atlas(self, name):
+
+        return (self.__manifest is not None and
+                name in self.__manifest['sprites'] and
+                name not in self.__reloaded and
+                not self.__in_pack(name))
 
     def load_sprite(self, name, no_cache=False):
 
-        if name not in self.__sprites or no_cache:
+        sprite = None if no_cache else self.__sprites.get(name)
+
+        if sprite is None:
 
-            path = os.path.join(self.__asset_dir,
-                                'sprites',
-                                name + '.png')
+            if self.__in_pack(name) and not no_cache:
 
-            sprite = pygame.image.load(path)
-            sprite.set_colorkey(self.__color_key)
-            sprite = sprite.convert()
+                sprite = self.__pack.sprite(name)
 
-            self.__sprites[name] = sprite
+            elif self.__in_atlas(name) and not no_cache:
+
+                sprite = self.__cut(name)
+
+            else:
+
+                sprite = self.__load_image(self.__sprite_path(name))
+
+            # Replacing the sprite drops its old masks, only once the new
+            # one is there
+            self.__sprites.put(name, sprite)
 
             logger.info("Sprite %s loaded into cache", name)
 
         logger.info("Sprite %s retrieved from cache", name)
-        return self.__sprites[name]
+        return sprite
+
+    def load_mask(self, name, region=None):
+
+        sprite = self.load_sprite(name)
+
+        mask = self.__sprites.mask(name, region)
+
+        if mask is None:
+
+            if region is not None:
+
+                sprite = sprite.subsurface(region)
+
+            # Uses the color key of the sprite
+            mask = pygame.mask.from_surface(sprite)
+
+            # Kept with the sprite, and evicted with it
+            self.__sprites.put_mask(name, mask, region)
+
+            logger.info("Mask of %s %s made", name, region or '')
+
+        return mask
+
+    def preload(self, names):
+        """QA.preload(names)
+
+        Loads the named sprites that aren't cached yet. The files are decoded
+        in parallel, then converted to the display format in one batch on the
+        calling thread.
+        """
+
+        names = set(name for name in names if name not in self.__sprites)
+
+        pages = set(self.__manifest['sprites'][name][0]
+                    for name in names
+                    if self.__in_atlas(name))
+        pages = list(pages.difference(self.__pages))
+
+        loose = []
+
+        for name in names:
+
+            if self.__in_atlas(name) or self.__in_pack(name):
+
+                continue
+
+            if os.path.isfile(self.__sprite_path(name)):
+
+                loose.append(name)
+
+            else:
+
+                logger.warning("No sprite file for %s to preload", name)
+
+        paths = ([self.__page_path(i) for i in pages] +
+                 [self.__sprite_path(name) for name in loose])
+
+        # Packed sprites need no decoding
+        for name in names:
+
+            if self.__in_pack(name):
+
+                self.__sprites.put(name, self.__pack.sprite(name))
+
+        if not paths:
+
+            return
+
+        pool = ThreadPool(min(self.__workers, len(paths)))
+
+        try:
+
+            images = pool.map(pygame.image.load, paths)
+
+        finally:
+
+            pool.close()
+            pool.join()
+
+        # Convert everything at once
+        images = [self.__prepare(image) for image in images]
+
+        for i, page in zip(pages, images):
+
+            self.__keep_page(i, page)
+
+        for name, sprite in zip(loose, images[len(pages):]):
+
+            self.__sprites.put(name, sprite)
+
+        for name in names:
+
+            if self.__in_atlas(name):
+
+                self.__sprites.put(name, self.__cut(name))
+
+        logger.info("%d sprites preloaded from %d files",
+                    len(names),
+                    len(paths))
+
+    def reload_changed(self):
+        """QA.reload_changed() -> set of sprite names
+
+        Reloads the cached sprites whose files changed since the last call and
+        returns the names of all the changed sprites. The others are loaded
+        from their files when next needed.
+
+        A file that can't be loaded (eg. it is still being written) leaves the
+        old sprite in place. It is tried again when the file changes next.
+        """
+
+        if self.__watcher is None:
+
+            return set()
+
+        names = set(os.path.splitext(file_name)[0]
+                    for file_name in self.__watcher.changes()
+                    if file_name.endswith('.png'))
+
+        failed = set()
+
+        for name in names:
+
+            if name in self.__sprites:
+
+                try:
+
+                    self.load_sprite(name, no_cache=True)
+
+                except (pygame.error, IOError) as error:
+
+                    logger.warning("Sprite %s not reloaded: %s", name, error)
+
+                    failed.add(name)
+
+                    continue
+
+                logger.info("Sprite %s reloaded after a change", name)
+
+            self.__reloaded.add(name)
+
+        return names - failed
+
+    def pin(self, name):
+        """QA.pin(name)
+
+        Loads a sprite and keeps it from being evicted from the cache. Meant
+        for sprites that are always on screen.
+        """
+
+        self.__sprites.pin(name)
+        self.load_sprite(name)
+
+    def unpin(self, name):
+        """QA.unpin(name)
+
+        Lets a pinned sprite be evicted again.
+        """
+
+        self.__sprites.unpin(name)
+
+    def cache_stats(self):
+        """QA.cache_stats() -> dict
+
+        See SpriteCache.stats.
+        """
+
+        return self.__sprites.stats()
 
     def clear_cache(self):
 
         logger.info("Sprite cache cleared")
-        self.__sprites = {}
+        logger.info("Sprite cache stats: %s", self.__sprites.stats())
+
+        for i in self.__pages:
+
+            self.__sprites.unpin((ATLAS_DIR, i))
+
+        self.__sprites.clear()
+        self.__pages = {}
+
+    def close(self):
+        """QA.close()
+
+        Unmaps the sprite pack and stops watching the sprite files.
+        """
+
+        if self.__pack is not None:
+
+            self.__pack.close()
+
+        if self.__watcher is not None:
+
+            self.__watcher.close()
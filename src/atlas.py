@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2012-2013 Karol Marcjan and Bartosz Boguniewicz
+#
+# This file is part of Quantee.
+#
+# Foobar is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Foobar is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import argparse
+import logging
+
+from yaml import safe_load, safe_dump
+
+__all__ = ['Skyline', 'pack', 'build_atlas', 'load_manifest']
+
+
+logger = logging.getLogger(__name__)
+
+logger.addHandler(logging.NullHandler())
+
+
+ATLAS_DIR = 'atlas'
+
+MANIFEST = 'atlas.yaml'
+
+
+class Skyline(object):
+    """Skyline((width, height)) -> an empty Skyline
+
+    Bottom-left skyline rectangle packer for a single page. The skyline is a
+    list of (x, y, width) segments marking the lowest free row at each column
+    range.
+    """
+
+    def __init__(self, size):
+
+        self.__size = size
+        self.__segments = [(0, 0, size[0])]
+
+    @property
+    def size(self):
+        """S.size -> (width, height)"""
+
+        return self.__size
+
+    def __fit(self, i, w, h):
+        """S.__fit(i, w, h) -> y or None
+
+        The lowest y at which a w by h rectangle fits when its left edge is at
+        the start of the i-th segment.
+        """
+
+        page_w, page_h = self.__size
+
+        x = self.__segments[i][0]
+
+        if x + w > page_w:
+
+            return None
+
+        y, left = 0, w
+
+        for sx, sy, sw in self.__segments[i:]:
+
+            y = max(y, sy)
+
+            left -= sw
+
+            if left <= 0:
+
+                break
+
+        if y + h > page_h:
+
+            return None
+
+        return y
+
+    def insert(self, w, h):
+        """S.insert(w, h) -> (x, y) or None
+
+        Places a w by h rectangle as low (and then as far left) as possible.
+        Returns None when it doesn't fit.
+        """
+
+        best = None
+
+        for i, (x, _, _) in enumerate(self.__segments):
+
+            y = self.__fit(i, w, h)
+
+            if y is not None and (best is None or (y, x) < best):
+
+                best = (y, x)
+
+        if best is None:
+
+            return None
+
+        y, x = best
+
+        # Cut the covered part out of the skyline and raise it
+        segments = []
+
+        for sx, sy, sw in self.__segments:
+
+            end = sx + sw
+
+            if end <= x or sx >= x + w:
+
+                segments.append((sx, sy, sw))
+
+                continue
+
+            if sx < x:
+
+                segments.append((sx, sy, x - sx))
+
+            if end > x + w:
+
+                segments.append((x + w, sy, end - x - w))
+
+        segments.append((x, y + h, w))
+        segments.sort()
+
+        # Merge neighbours of equal height
+        merged = [segments[0]]
+
+        for sx, sy, sw in segments[1:]:
+
+            px, py, pw = merged[-1]
+
+            if py == sy:
+
+                merged[-1] = (px, py, pw + sw)
+
+            else:
+
+                merged.append((sx, sy, sw))
+
+        self.__segments = merged
+
+        return x, y
+
+
+def pack(sizes, page_size=(1024, 1024), padding=1):
+    """pack(sizes[, (width, height)[, padding]]) -> (page sizes, placements)
+
+    Packs rectangles of the given (w, h) sizes into as few pages as it can.
+    Returns a list of page sizes and a list of (page, x, y) placements in the
+    same order as the sizes. Rectangles larger than a page get a page of their
+    own.
+    """
+
+    pages = []
+    placements = [None] * len(sizes)
+
+    order = sorted(range(len(sizes)),
+                   key=lambda i: (-sizes[i][1], -sizes[i][0]))
+
+    for i in order:
+
+        w, h = sizes[i]
+        w, h = w + padding, h + padding
+
+        for page, skyline in enumerate(pages):
+
+            spot = skyline.insert(w, h)
+
+            if spot is not None:
+
+                break
+
+        else:
+
+            page = len(pages)
+
+            skyline = Skyline((max(page_size[0], w), max(page_size[1], h)))
+            pages.append(skyline)
+
+            spot = skyline.insert(w, h)
+
+        placements[i] = (page, spot[0], spot[1])
+
+    return [page.size for page in pages], placements
+
+
+def load_manifest(asset_dir):
+    """load_manifest(asset_dir) -> dict or None
+
+    Reads the atlas manifest from an assets directory. Returns None when there
+    is no atlas.
+    """
+
+    path = os.path.join(asset_dir, ATLAS_DIR, MANIFEST)
+
+    if not os.path.isfile(path):
+
+        return None
+
+    with open(path, 'r') as manifest_file:
+
+        return safe_load(manifest_file)
+
+
+def build_atlas(asset_dir, color_key=(255, 0, 255), page_size=(1024, 1024),
+                padding=1):
+    """build_atlas(asset_dir[, color_key[, page_size[, padding]]]) -> manifest
+
+    Packs every sprite in the `sprites` directory of asset_dir into pages
+    saved in its `atlas` directory, together with a manifest describing where
+    each sprite ended up. Unused space is filled with the color key.
+    """
+
+    import pygame
+
+    sprite_dir = os.path.join(asset_dir, 'sprites')
+    atlas_dir = os.path.join(asset_dir, ATLAS_DIR)
+
+    names = sorted(os.path.splitext(file_name)[0]
+                   for file_name in os.listdir(sprite_dir)
+                   if file_name.endswith('.png'))
+
+    images = [pygame.image.load(os.path.join(sprite_dir, name + '.png'))
+              for name in names]
+
+    page_sizes, placements = pack(
+        [image.get_size() for image in images],
+        page_size,
+        padding)
+
+    pages = []
+
+    for size in page_sizes:
+
+        page = pygame.Surface(size)
+        page.fill(color_key)
+
+        pages.append(page)
+
+    manifest = dict(pages=[], sprites={})
+
+    for name, image, (i, x, y) in zip(names, images, placements):
+
+        pages[i].blit(image, (x, y))
+
+        w, h = image.get_size()
+
+        manifest['sprites'][name] = [i, x, y, w, h]
+
+    if not os.path.isdir(atlas_dir):
+
+        os.makedirs(atlas_dir)
+
+    for i, page in enumerate(pages):
+
+        page_name = 'atlas_%d.png' % i
+
+        pygame.image.save(page, os.path.join(atlas_dir, page_name))
+
+        manifest['pages'].append(page_name)
+
+    with open(os.path.join(atlas_dir, MANIFEST), 'w') as manifest_file:
+
+        safe_dump(manifest, manifest_file, default_flow_style=None)
+
+    logger.info('%d sprites packed into %d atlas pages',
+                len(names),
+                len(pages))
+
+    return manifest
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(
+        description='Packs the sprites into atlas pages')
+
+    parser.add_argument(
+        'asset_dir',
+        nargs='?',
+        default=os.path.join(
+            os.path.dirname(os.path.abspath(__file__)),
+            '..',
+            'assets'))
+
+    parser.add_argument(
+        '-s', '--page-size',
+        dest='page_size',
+        type=int,
+        default=1024)
+
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    build_atlas(args.asset_dir, page_size=(args.page_size, args.page_size))
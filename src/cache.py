@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2012-2013 Karol Marcjan and Bartosz Boguniewicz
+#
+# This file is part of Quantee.
+#
+# Foobar is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Foobar is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
+
+import logging
+
+from collections import OrderedDict
+
+__all__ = ['SpriteCache', 'surface_size', 'mask_size']
+
+
+logger = logging.getLogger(__name__)
+
+logger.addHandler(logging.NullHandler())
+
+
+def surface_size(surface):
+    """surface_size(surface) -> number of bytes
+
+    Memory taken by the pixels of a Surface. Subsurfaces share their parent's
+    pixels, so they are considered free, and the parent should be charged for
+    instead.
+    """
+
+    if surface.get_parent() is not None:
+
+        return 0
+
+    return surface.get_width() * surface.get_height() * surface.get_bytesize()
+
+
+def mask_size(mask):
+    """mask_size(mask) -> number of bytes
+
+    Memory taken by the bits of a pygame.mask.Mask, roughly.
+    """
+
+    w, h = mask.get_size()
+
+    return (w * h + 7) // 8
+
+
+class SpriteCache(object):
+    """SpriteCache([budget[, sizeof]]) -> an empty SpriteCache
+
+    A least recently used cache of sprites kept under a memory budget given in
+    bytes. When storing a sprite pushes the total size over the budget, the
+    least recently used sprites are evicted until it fits again. A budget of
+    None means no limit.
+
+    Pinned sprites are never evicted, but do count towards the budget.
+
+    Collision masks made out of a sprite are stored next to it, count towards
+    the budget too and go away with it, be it evicted or replaced.
+
+    `sizeof` tells the size of a sprite and defaults to surface_size,
+    `mask_sizeof` does the same for masks and defaults to mask_size.
+    """
+
+    def __init__(self, budget=None, sizeof=surface_size,
+                 mask_sizeof=mask_size):
+
+        self.__budget = budget
+        self.__sizeof = sizeof
+        self.__mask_sizeof = mask_sizeof
+
+        self.__entries = OrderedDict()
+        self.__pinned = set()
+        self.__size = 0
+
+        self.__hits = 0
+        self.__misses = 0
+        self.__evictions = 0
+
+    def __contains__(self, name):
+        """SC.__contains__(name) <=> name in SC"""
+
+        return name in self.__entries
+
+    def __len__(self):
+        """SC.__len__() <=> len(SC)"""
+
+        return len(self.__entries)
+
+    def get(self, name):
+        """SC.get(name) -> a sprite or None
+
+        Retrieves a sprite, marking it as the most recently used one.
+        """
+
+        if name not in self.__entries:
+
+            self.__misses += 1
+
+            return None
+
+        self.__hits += 1
+
+        entry = self.__entries.pop(name)
+        self.__entries[name] = entry
+
+        return entry[0]
+
+    def mask(self, name, region=None):
+        """SC.mask(name[, region]) -> a mask or None
+
+        Retrieves the mask stored for a region (None meaning the whole) of a
+        sprite.
+        """
+
+        if name not in self.__entries:
+
+            return None
+
+        return self.__entries[name][2].get(region)
+
+    def put_mask(self, name, mask, region=None):
+        """SC.put_mask(name, mask[, region])
+
+        Stores a mask of a region (None meaning the whole) of a stored sprite,
+        evicting others if necessary. Masks of sprites that aren't stored are
+        not kept.
+        """
+
+        if name not in self.__entries:
+
+            return
+
+        sprite, size, masks = self.__entries[name]
+
+        added = self.__mask_sizeof(mask)
+
+        if region in masks:
+
+            added -= self.__mask_sizeof(masks[region])
+
+        masks[region] = mask
+
+        self.__entries[name] = (sprite, size + added, masks)
+        self.__size += added
+
+        self.__evict()
+
+    def put(self, name, sprite):
+        """SC.put(name, sprite)
+
+        Stores a sprite as the most recently used one, evicting others if
+        necessary.
+        """
+
+        self.discard(name)
+
+        size = self.__sizeof(sprite)
+
+        self.__entries[name] = (sprite, size, {})
+        self.__size += size
+
+        self.__evict()
+
+    def discard(self, name):
+        """SC.discard(name)
+
+        Forgets a sprite, if it is stored. Keeps it pinned.
+        """
+
+        if name in self.__entries:
+
+            sprite, size, masks = self.__entries.pop(name)
+
+            self.__size -= size
+
+    def __evict(self):
+
+        if self.__budget is None:
+
+            return
+
+        while self.__size > self.__budget:
+
+            for name in self.__entries:
+
+                if name not in self.__pinned:
+
+                    break
+
+            else:
+
+                logger.warning('Pinned sprites exceed the %d byte budget',
+                               self.__budget)
+
+                return
+
+            self.discard(name)
+            self.__evictions += 1
+
+            logger.debug('Sprite %s evicted', name)
+
+    def pin(self, name):
+        """SC.pin(name)
+
+        Keeps the sprite from being evicted.
+        """
+
+        self.__pinned.add(name)
+
+    def unpin(self, name):
+        """SC.unpin(name)
+
+        Lets the sprite be evicted again.
+        """
+
+        self.__pinned.discard(name)
+
+        self.__evict()
+
+    def clear(self):
+        """SC.clear()
+
+        Forgets all the sprites that aren't pinned.
+        """
+
+        for name in list(self.__entries):
+
+            if name not in self.__pinned:
+
+                self.discard(name)
+
+    def budget(self):
+        """SC.budget() -> number of bytes or None"""
+
+        return self.__budget
+
+    def set_budget(self, budget):
+        """SC.set_budget(budget)
+
+        Changes the budget, evicting sprites if it shrank.
+        """
+
+        self.__budget = budget
+
+        self.__evict()
+
+    def stats(self):
+        """SC.stats() -> dict
+
+        Tells the number of hits, misses and evictions so far, and the current
+        size and budget.
+        """
+
+        return dict(hits=self.__hits,
+                    misses=self.__misses,
+                    evictions=self.__evictions,
+                    size=self.__size,
+                    budget=self.__budget,
+                    sprites=len(self.__entries),
+                    pinned=len(self.__pinned))
@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2012-2013 Karol Marcjan and Bartosz Boguniewicz
+#
+# This file is part of Quantee.
+#
+# Foobar is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Foobar is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import logging
+
+from bisect import bisect_right
+
+from yaml import safe_load
+
+from behaviour import Behaviour
+
+__all__ = ['Clip', 'ClipLibrary', 'Animated', 'load_clips']
+
+
+logger = logging.getLogger(__name__)
+
+logger.addHandler(logging.NullHandler())
+
+
+class Clip(object):
+    """Clip(sheet, regions, durations[, loop]) -> a Clip
+
+    An animation made of regions (x, y, w, h) of the sprite named sheet, each
+    shown for the corresponding duration in milliseconds.
+
+    When each frame ends is computed up front, so playing the clip boils down
+    to adding up the time that passed and looking the frame up. As it goes by
+    time rather than by physics steps, it plays just as fast whatever the
+    time step.
+    """
+
+    def __init__(self, sheet, regions, durations, loop=True):
+
+        self.__sheet = sheet
+        self.__regions = [tuple(region) for region in regions]
+        self.__loop = loop
+
+        self.__ends = []
+
+        end = 0.0
+
+        for duration in durations:
+
+            end += duration
+
+            self.__ends.append(end)
+
+    def sheet(self):
+        """C.sheet() -> name of the sprite the frames are cut out of"""
+
+        return self.__sheet
+
+    def region(self, frame):
+        """C.region(frame) -> (x, y, w, h) of the frame on the sheet"""
+
+        return self.__regions[frame]
+
+    def size(self):
+        """C.size() -> (width, height) of the first frame"""
+
+        return self.__regions[0][2:]
+
+    def at(self, time):
+        """C.at(time) -> (time, frame)
+
+        The frame to show time milliseconds after the clip started. The
+        returned time is wrapped around for looping clips and stopped at the
+        end for the others.
+        """
+
+        total = self.__ends[-1]
+
+        if time >= total:
+
+            if self.__loop and total > 0:
+
+                time %= total
+
+            else:
+
+                time = total
+
+        frame = bisect_right(self.__ends, time)
+
+        return time, min(frame, len(self.__ends) - 1)
+
+
+class ClipLibrary(object):
+    """ClipLibrary() -> an empty ClipLibrary
+
+    Gives Clips small integer IDs, which is what Entities carry around.
+    """
+
+    def __init__(self):
+
+        self.__clips = []
+        self.__ids = {}
+
+    def __getitem__(self, clip_id):
+        """CL.__getitem__(clip_id) <=> CL[clip_id]"""
+
+        return self.__clips[clip_id]
+
+    def __len__(self):
+        """CL.__len__() <=> len(CL)"""
+
+        return len(self.__clips)
+
+    def add(self, name, clip):
+        """CL.add(name, clip) -> the clip's ID"""
+
+        self.__ids[name] = len(self.__clips)
+        self.__clips.append(clip)
+
+        return self.__ids[name]
+
+    def id(self, name):
+        """CL.id(name) -> the ID of the named clip"""
+
+        return self.__ids[name]
+
+    def sheets(self):
+        """CL.sheets() -> set of the sprite names used by the clips"""
+
+        return set(clip.sheet() for clip in self.__clips)
+
+
+def load_clips(path, library=None):
+    """load_clips(path[, library]) -> a ClipLibrary
+
+    Reads clips from a YAML file shaped like
+
+        psi_run:
+            sheet: psi_sheet
+            loop: true
+            frames:
+                - [0, 0, 40, 50, 100]   # x, y, w, h, duration in ms
+                - [40, 0, 40, 50, 100]
+
+    and adds them to the library (a new one by default).
+    """
+
+    if library is None:
+
+        library = ClipLibrary()
+
+    with open(path, 'r') as clip_file:
+
+        definitions = safe_load(clip_file) or {}
+
+    for name in sorted(definitions):
+
+        definition = definitions[name]
+
+        frames = definition['frames']
+
+        library.add(name, Clip(definition['sheet'],
+                               [frame[:4] for frame in frames],
+                               [frame[4] for frame in frames],
+                               definition.get('loop', True)))
+
+    logger.info('%d clips loaded from %s', len(definitions), path)
+
+    return library
+
+
+class Animated(Behaviour):
+    """Animated(behaviour, clips, by_state) -> a Behaviour
+
+    Wraps another Behaviour and plays a clip from the ClipLibrary clips,
+    chosen by the state name of the Entity through the by_state dictionary of
+    state names to clip names. States without a clip show the sprite named
+    after them, as usual.
+
+    Entities driven by it draw the clips from the same library, see
+    Behaviour.clips. Everything else is left to the wrapped Behaviour.
+    """
+
+    def __init__(self, behaviour, clips, by_state):
+
+        self.__behaviour = behaviour
+
+        self.__by_state = dict((state, clips.id(name))
+                               for state, name in by_state.items())
+
+        self.__clips = clips
+
+    def prepare(self, prev, curr, next):
+
+        self.__behaviour.prepare(prev, curr, next)
+
+        for st in (prev, curr, next):
+
+            st.clip = self.__by_state.get(st.state)
+            st.clip_time = 0
+            st.frame = 0
+
+            self.__show(st)
+
+    def clips(self):
+
+        return self.__clips
+
+    def tiers(self):
+
+        return self.__behaviour.tiers()
+
+    def contact(self, kind, other, stage, prev, curr, next):
+
+        self.__behaviour.contact(kind, other, stage, prev, curr, next)
+
+    def __play(self, elapsed, curr, next):
+
+        clip = self.__by_state.get(next.state)
+
+        # Switching clips starts the new one from the beginning
+        next.clip_time = curr.clip_time + elapsed if clip == curr.clip else 0
+        next.clip = clip
+
+        if clip is not None:
+
+            next.clip_time, next.frame = \
+                self.__clips[clip].at(next.clip_time)
+
+        self.__show(next)
+
+    def __show(self, st):
+
+        # Written down for drawing and masks, see StateWrapper.shown
+        if st.clip is None:
+
+            st.sheet = st.region = None
+
+        else:
+
+            clip = self.__clips[st.clip]
+
+            st.sheet = clip.sheet()
+            st.region = clip.region(st.frame)
+
+    def decide(self, dt, event, stage, hint, prev, curr, next):
+
+        self.__behaviour.decide(dt, event, stage, hint, prev, curr, next)
+
+        self.__play(dt, curr, next)
+
+    def advance(self, dt, steps, event, stage, hint, prev, curr, next):
+
+        self.__behaviour.advance(dt, steps, event, stage, hint,
+                                 prev, curr, next)
+
+        self.__play(dt * steps, curr, next)
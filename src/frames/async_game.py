@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2012-2013 Karol Marcjan and Bartosz Boguniewicz
+#
+# This file is part of Quantee.
+#
+# Foobar is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Foobar is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
+
+# asyncio needs Python 3, but this is written so that Python 2 can still
+# compile it. Nothing else imports it.
+
+import types
+import asyncio
+import logging
+
+from game import Game
+
+__all__ = ['AsyncGame']
+
+
+logger = logging.getLogger(__name__)
+
+logger.addHandler(logging.NullHandler())
+
+
+def _wait(awaitable):
+    # What yield from would do, for asyncio's needs: it always sends None and
+    # reports results through futures
+
+    steps = awaitable.__await__()
+
+    try:
+
+        for step in steps:
+
+            yield step
+
+    finally:
+
+        steps.close()
+
+
+class AsyncGame(Game):
+    """AsyncGame(engine, drawing_strategy, init_level[, margin[, ...]]) ->
+    an AsyncGame
+
+    A Game whose run returns an awaitable, for use with asyncio. Instead of
+    blocking in the engine until a frame ends, it awaits until margin
+    milliseconds before that, so that other coroutines (saving, uploading,
+    shipping logs) can use the slack. Then the Game's Tasks get what is left
+    and the engine waits out the rest as usual.
+
+    Each frame is rendered and stepped without awaiting in between, so the
+    game plays exactly as a Game would.
+
+    The remaining arguments are those of Game. Waiting until the deadline
+    needs an engine that knows its time_left.
+    """
+
+    def __init__(self, engine, drawing_strategy, init_level, margin=2,
+                 **kwargs):
+
+        super(AsyncGame, self).__init__(engine, drawing_strategy, init_level,
+                                        **kwargs)
+
+        self.__margin = margin
+
+    @types.coroutine
+    def deadline(self):
+        """AG.deadline() -> an awaitable
+
+        Sleeps until just before the frame ends, or at least lets the other
+        coroutines have a go.
+        """
+
+        time_left = self.engine().time_left()
+
+        if time_left is not None and time_left > self.__margin:
+
+            delay = (time_left - self.__margin) / 1000.0
+
+        else:
+
+            delay = 0
+
+        for step in _wait(asyncio.sleep(delay)):
+
+            yield step
+
+    @types.coroutine
+    def run(self):
+        """AG.run() -> an awaitable
+
+        Run the Game, when awaited.
+        """
+
+        self.start()
+
+        try:
+
+            while self.playing():
+
+                self.begin_frame()
+
+                self.render()
+
+                work_time = self.finish_work()
+
+                for step in self.deadline():
+
+                    yield step
+
+                self.idle()
+
+                frame_time = self.tick(work_time)
+
+                self.multistep_physics(frame_time)
+
+                self.update()
+
+            self.tasks().finish()
+
+        finally:
+
+            self.stop()
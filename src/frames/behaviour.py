@@ -26,3 +26,50 @@ class Behaviour(object):
     def decide(self, dt, event, stage, hint, prev, curr, next):
 
         raise NotImplementedError()
+
+    def tiers(self):
+        """B.tiers() -> tuple of (distance, k) pairs, or None
+
+        Opts the Entity into updates every k steps once at least distance away
+        from the viewport (see UpdateTiers). The pairs go from the nearest
+        tier to the furthest.
+
+        The default implementation returns None, updating every step.
+        """
+
+        return None
+
+    def clips(self):
+        """B.clips() -> a ClipLibrary, or None
+
+        The library the clip IDs the Behaviour puts in states refer to, which
+        the Entity draws the clips from.
+
+        The default implementation returns None, as it plays no clips.
+        """
+
+        return None
+
+    def advance(self, dt, steps, event, stage, hint, prev, curr, next):
+        """B.advance(dt, steps, event, stage, hint, prev, curr, next)
+
+        Decides for steps steps of length dt at once, for Entities updated
+        less often than every step.
+
+        The default implementation makes one decide with a dt steps times
+        longer.
+        """
+
+        self.decide(dt * steps, event, stage, hint, prev, curr, next)
+
+    def contact(self, kind, other, stage, prev, curr, next):
+        """B.contact(kind, other, stage, prev, curr, next)
+
+        Called after a step when a watched contact of the Entity with other
+        begins, persists or ends (see Stage.watch_contacts). curr is the
+        state the Entity is in now.
+
+        The default implementation ignores contacts.
+        """
+
+        pass
@@ -18,7 +18,8 @@
 # along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
 
 
-__all__ = ['Box', 'collide']
+__all__ = ['Box', 'collide', 'intersect', 'collide_masks', 'ray_hit',
+           'lerp', 'gap']
 
 
 def bounding(b1, b2):
@@ -37,6 +38,31 @@ def bounding(b1, b2):
     return Box(x, y, w, h)
 
 
+def lerp(a, b, alpha):
+    """lerp(a, b, alpha) -> a Box
+
+    The box alpha of the way from a to b, alpha being 0 for a and 1 for b.
+    """
+
+    return Box(a.x + (b.x - a.x) * alpha,
+               a.y + (b.y - a.y) * alpha,
+               a.w + (b.w - a.w) * alpha,
+               a.h + (b.h - a.h) * alpha)
+
+
+def gap(a, b):
+    """gap(a, b) -> distance
+
+    How far apart two boxes are along the axis they are furthest apart on,
+    0 when they intersect.
+    """
+
+    dx = max(b.x - (a.x + a.w), a.x - (b.x + b.w), 0)
+    dy = max(b.y - (a.y + a.h), a.y - (b.y + b.h), 0)
+
+    return max(dx, dy)
+
+
 def __corners(box, margin):
 
     if isinstance(margin, tuple) and len(margin) == 2:
@@ -72,6 +98,72 @@ def collide(a, b, margin=0):
     return False
 
 
+def intersect(a, b):
+    """intersect(a, b) -> bool
+
+    Tells whether two boxes share any point. Unlike collide, it also catches
+    boxes crossing each other without either having a corner inside the other.
+    """
+
+    return (a.x <= b.x + b.w and b.x <= a.x + a.w and
+            a.y <= b.y + b.h and b.y <= a.y + a.h)
+
+
+def ray_hit(origin, direction, box):
+    """ray_hit((x, y), (dx, dy), box) -> t or None
+
+    The smallest t >= 0 for which the point origin + t * direction lies in the
+    box, or None if the ray misses it.
+    """
+
+    t_in, t_out = 0.0, float('inf')
+
+    for o, d, low, high in ((origin[0], direction[0], box.x, box.x + box.w),
+                            (origin[1], direction[1], box.y, box.y + box.h)):
+
+        if d == 0:
+
+            if o < low or o > high:
+
+                return None
+
+            continue
+
+        t_low = (low - o) / float(d)
+        t_high = (high - o) / float(d)
+
+        if t_low > t_high:
+
+            t_low, t_high = t_high, t_low
+
+        t_in = max(t_in, t_low)
+        t_out = min(t_out, t_high)
+
+        if t_in > t_out:
+
+            return None
+
+    return t_in
+
+
+def collide_masks(a_box, a_mask, b_box, b_mask):
+    """collide_masks(a_box, a_mask, b_box, b_mask) -> bool
+
+    Narrow phase check telling whether two bitmasks (as made by
+    pygame.mask) overlap when their bottom left corners are placed at the
+    corners of the corresponding boxes.
+    """
+
+    a_h = a_mask.get_size()[1]
+    b_h = b_mask.get_size()[1]
+
+    # Masks have the y axis pointing down
+    offset = (int(b_box.x - a_box.x),
+              int(a_box.y + a_h - b_box.y - b_h))
+
+    return a_mask.overlap(b_mask, offset) is not None
+
+
 class Box(object):
     """Box(x, y, w, h) -> a Box
 
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2012-2013 Karol Marcjan and Bartosz Boguniewicz
+#
+# This file is part of Quantee.
+#
+# Foobar is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Foobar is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import math
+import logging
+
+from boxes import Box
+
+__all__ = ['Camera']
+
+
+logger = logging.getLogger(__name__)
+
+logger.addHandler(logging.NullHandler())
+
+
+class Camera(object):
+    """Camera((width, height), target[, dead_zone[, smoothing]]) -> a Camera
+
+    Keeps a viewport of the given size following the target Entity around a
+    Stage.
+
+      * `dead_zone` is the (width, height) of a box in the middle of the view
+        inside which the target can move without the camera following it.
+        Defaults to (0, 0).
+
+      * `smoothing` is the time (in the same units as the physics time step)
+        after which the camera covers about two thirds of the distance to
+        where it should be. Zero makes it snap immediately. Defaults to 0.
+
+    The viewport is always kept inside the Stage and at integer coordinates,
+    so that the Engine can reuse the previous frame by scrolling it. Like
+    Entities, it can be seen in between the last two physics steps.
+    """
+
+    def __init__(self, size, target, dead_zone=(0, 0), smoothing=0):
+
+        self.__size = size
+        self.__target = target
+
+        self.__dead_zone = dead_zone
+        self.__smoothing = smoothing
+
+        self.__x = None
+        self.__y = None
+
+        # Where it was before the last update
+        self.__past = None
+
+        logger.info('%dx%d Camera created', size[0], size[1])
+
+    def target(self):
+        """C.target() -> the followed Entity"""
+
+        return self.__target
+
+    def set_target(self, target):
+        """C.set_target(target)
+
+        Start following a different Entity.
+        """
+
+        self.__target = target
+
+    def __goal(self, stage):
+        """C.__goal(stage) -> (x, y)
+
+        Where the camera should be, ignoring smoothing.
+        """
+
+        w, h = self.__size
+        dz_w, dz_h = self.__dead_zone
+
+        box = self.__target.present().r_box()
+
+        c_x = box.x + box.w / 2.0
+        c_y = box.y + box.h / 2.0
+
+        if self.__x is None:
+
+            x, y = c_x - w / 2.0, c_y - h / 2.0
+
+        else:
+
+            x, y = self.__x, self.__y
+
+            left = x + (w - dz_w) / 2.0
+            bottom = y + (h - dz_h) / 2.0
+
+            if c_x < left:
+
+                x -= left - c_x
+
+            elif c_x > left + dz_w:
+
+                x += c_x - left - dz_w
+
+            if c_y < bottom:
+
+                y -= bottom - c_y
+
+            elif c_y > bottom + dz_h:
+
+                y += c_y - bottom - dz_h
+
+        # Keep the view inside the Stage
+        stage_w, stage_h = stage.size
+
+        x = min(max(x, 0), max(stage_w - w, 0))
+        y = min(max(y, 0), max(stage_h - h, 0))
+
+        return x, y
+
+    def update(self, dt, stage):
+        """C.update(dt, stage)
+
+        Move the camera towards the target.
+        """
+
+        goal_x, goal_y = self.__goal(stage)
+
+        if self.__x is not None:
+
+            self.__past = (self.__x, self.__y)
+
+        if self.__x is None or self.__smoothing <= 0:
+
+            self.__x, self.__y = goal_x, goal_y
+
+        else:
+
+            k = 1 - math.exp(-float(dt) / self.__smoothing)
+
+            self.__x += (goal_x - self.__x) * k
+            self.__y += (goal_y - self.__y) * k
+
+    def viewport(self, stage, alpha=1):
+        """C.viewport(stage[, alpha]) -> a Box describing the visible part of
+        the stage
+
+        With alpha less than 1 the camera is seen alpha of the way from where
+        it was before the last update to where it is now, to match Entities
+        drawn the same way (see Entity.r_box_at).
+        """
+
+        if self.__x is None:
+
+            self.update(0, stage)
+
+        x, y = self.__x, self.__y
+
+        if alpha < 1 and self.__past is not None:
+
+            past_x, past_y = self.__past
+
+            x = past_x + (x - past_x) * alpha
+            y = past_y + (y - past_y) * alpha
+
+        w, h = self.__size
+
+        return Box(int(round(x)), int(round(y)), w, h)
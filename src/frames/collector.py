@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2012-2013 Karol Marcjan and Bartosz Boguniewicz
+#
+# This file is part of Quantee.
+#
+# Foobar is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Foobar is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import gc
+import logging
+
+from timeit import default_timer
+
+__all__ = ['Collector']
+
+
+logger = logging.getLogger(__name__)
+
+logger.addHandler(logging.NullHandler())
+
+
+class Collector(object):
+    """Collector([full_every]) -> a Collector
+
+    Takes cyclic garbage collection over from Python, so that it doesn't
+    interrupt frames at random.
+
+    Once started, automatic collection is off. Instead, each frame the
+    youngest generation is collected if it is due, and the older ones too if
+    also due and what is left of the frame is enough (as judged by how long
+    they took before). A full collection is made at least every full_every
+    frames regardless, so garbage can't pile up forever.
+
+    Objects alive when a new level starts can be frozen, moving them out of
+    the way of later collections (only on Pythons with gc.freeze).
+    """
+
+    def __init__(self, full_every=600):
+
+        self.__full_every = full_every
+
+        self.__frames = 0
+        self.__was_enabled = None
+
+        # Learned pause times, and statistics, per generation
+        self.__expected = [0.0, 0.0, 0.0]
+        self.__collections = [0, 0, 0]
+        self.__total = [0.0, 0.0, 0.0]
+        self.__longest = [0.0, 0.0, 0.0]
+
+    def start(self):
+        """C.start()
+
+        Turns automatic collection off.
+        """
+
+        self.__was_enabled = gc.isenabled()
+
+        gc.disable()
+
+        logger.info('Automatic garbage collection disabled')
+
+    def stop(self):
+        """C.stop()
+
+        Turns automatic collection back on, if it was on before start.
+        """
+
+        if self.__was_enabled:
+
+            gc.enable()
+
+            logger.info('Automatic garbage collection enabled')
+
+    def freeze(self):
+        """C.freeze()
+
+        Collects everything and moves what survived, like a freshly built
+        level, to the permanent generation. Whatever was frozen before is
+        unfrozen first, so the garbage of the previous level does get
+        collected.
+        """
+
+        if not hasattr(gc, 'freeze'):
+
+            logger.info('This Python can not freeze objects')
+
+            return
+
+        gc.unfreeze()
+
+        self.__collect(2)
+
+        gc.freeze()
+
+        logger.info('%d objects frozen', gc.get_freeze_count())
+
+    def __collect(self, generation):
+
+        started = default_timer()
+
+        gc.collect(generation)
+
+        pause = (default_timer() - started) * 1000
+
+        self.__collections[generation] += 1
+        self.__total[generation] += pause
+        self.__longest[generation] = max(self.__longest[generation], pause)
+
+        # Pauses vary, remember mostly the recent ones
+        self.__expected[generation] += (
+            pause - self.__expected[generation]) * 0.25
+
+        logger.debug('Generation %d collected in %f ms', generation, pause)
+
+        return pause
+
+    def collect(self, time_left):
+        """C.collect(time_left)
+
+        Collects what is due and fits within time_left milliseconds (None
+        meaning unknown, so only what is due anyway). To be called once a
+        frame, when the frame's work is done.
+        """
+
+        self.__frames += 1
+
+        if self.__frames >= self.__full_every:
+
+            self.__frames = 0
+
+            self.__collect(2)
+
+            return
+
+        time_left = time_left or 0
+
+        counts = gc.get_count()
+        thresholds = gc.get_threshold()
+
+        # The oldest generation due and affordable takes the younger along
+        for generation in (2, 1, 0):
+
+            if counts[generation] < thresholds[generation]:
+
+                continue
+
+            if generation == 0 or self.__expected[generation] <= time_left:
+
+                if generation == 2:
+
+                    self.__frames = 0
+
+                self.__collect(generation)
+
+                return
+
+    def stats(self):
+        """C.stats() -> dict of collection statistics per generation
+
+        Each generation has its number of collections and the total and
+        longest pause in milliseconds.
+        """
+
+        return dict((generation,
+                     dict(collections=self.__collections[generation],
+                          total_ms=self.__total[generation],
+                          longest_ms=self.__longest[generation]))
+                    for generation in (0, 1, 2))
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2012-2013 Karol Marcjan and Bartosz Boguniewicz
+#
+# This file is part of Quantee.
+#
+# Foobar is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Foobar is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import logging
+
+from boxes import intersect
+
+__all__ = ['Contacts', 'BEGIN', 'PERSIST', 'END']
+
+
+logger = logging.getLogger(__name__)
+
+logger.addHandler(logging.NullHandler())
+
+
+BEGIN = 'begin'
+PERSIST = 'persist'
+END = 'end'
+
+
+def is_of_kind(entity, kind):
+    """is_of_kind(entity, kind) -> bool
+
+    Kinds are either Entity classes or tag strings.
+    """
+
+    if isinstance(kind, basestring):
+
+        return kind in entity.tags()
+
+    return isinstance(entity, kind)
+
+
+class Contacts(object):
+    """Contacts(index) -> a Contacts tracker
+
+    Finds which Entities of watched pairs of kinds touch, using a SpatialHash
+    of their b_boxes, and tells them when contacts begin, persist and end.
+    Only the Entities of the less numerous kind of each pair are looked up in
+    the index, so kinds nothing ever touches cost next to nothing.
+
+    Entities get told through their tell_contact(kind, other, stage) method.
+    """
+
+    def __init__(self, index):
+
+        self.__index = index
+
+        self.__pairs = []
+        self.__members = {}
+
+        self.__touching = set()
+
+    def watch(self, kind_a, kind_b, entities):
+        """C.watch(kind_a, kind_b, entities)
+
+        Starts tracking contacts between Entities of the two kinds. entities
+        should be all the Entities already spawned.
+        """
+
+        for kind in (kind_a, kind_b):
+
+            if kind not in self.__members:
+
+                self.__members[kind] = set(entity
+                                           for entity in entities
+                                           if is_of_kind(entity, kind))
+
+        self.__pairs.append((kind_a, kind_b))
+
+        logger.info('Watching contacts between %s and %s', kind_a, kind_b)
+
+    def tell_spawned(self, entity):
+
+        for kind, members in self.__members.items():
+
+            if is_of_kind(entity, kind):
+
+                members.add(entity)
+
+    def tell_is_dead(self, entity, stage):
+
+        for members in self.__members.values():
+
+            members.discard(entity)
+
+        ended = set(pair for pair in self.__touching if entity in pair)
+
+        self.__touching.difference_update(ended)
+
+        for a, b in ended:
+
+            other = b if a is entity else a
+
+            other.tell_contact(END, entity, stage)
+
+    def __touching_now(self):
+
+        touching = set()
+
+        for kind_a, kind_b in self.__pairs:
+
+            members_a = self.__members[kind_a]
+            members_b = self.__members[kind_b]
+
+            # Look up the smaller side in the index
+            if len(members_b) < len(members_a):
+
+                members_a, members_b = members_b, members_a
+
+            for a in members_a:
+
+                b_box = a.present().b_box()
+
+                for b in self.__index.query(b_box):
+
+                    if b is not a and b in members_b and\
+                            intersect(b_box, b.present().b_box()):
+
+                        # The same pair, whichever way round it was found
+                        if id(a) < id(b):
+
+                            touching.add((a, b))
+
+                        else:
+
+                            touching.add((b, a))
+
+        return touching
+
+    def update(self, stage):
+        """C.update(stage)
+
+        Finds the current contacts and tells the Entities about them. Meant to
+        be called once per step.
+        """
+
+        if not self.__pairs:
+
+            return
+
+        touching = self.__touching_now()
+
+        for pairs, kind in ((touching - self.__touching, BEGIN),
+                            (touching & self.__touching, PERSIST),
+                            (self.__touching - touching, END)):
+
+            for a, b in pairs:
+
+                a.tell_contact(kind, b, stage)
+                b.tell_contact(kind, a, stage)
+
+        self.__touching = touching
@@ -17,8 +17,9 @@
 # You should have received a copy of the GNU General Public License
 # along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
 
+from camera import Camera
 
-__all__ = ['Director']
+__all__ = ['Director', 'FollowingDirector']
 
 
 class Director(object):
@@ -42,8 +43,43 @@ class Director(object):
 
         raise NotImplementedError()
 
-    def viewport(self, stage):
-        """D.viewport(stage) -> a Box describing the visible part of the screen
+    def viewport(self, stage, alpha=1):
+        """D.viewport(stage[, alpha]) -> a Box describing the visible part of
+        the screen
+
+        alpha tells how far between the last two physics steps the frame is
+        drawn, for viewports that move.
         """
 
         raise NotImplementedError()
+
+
+class FollowingDirector(Director):
+    """FollowingDirector((width, height), target[, dead_zone[, smoothing]]) ->
+    a Director with a moving camera
+
+    Abstract base class for Directors whose viewport follows an Entity. See
+    Camera for the meaning of the arguments.
+
+    Subclasses overriding orchestrate should call it on the superclass, so
+    that the camera keeps moving.
+
+    It is opt-in: the Quantee level fits the screen and keeps a still camera.
+    """
+
+    def __init__(self, size, target, dead_zone=(0, 0), smoothing=0):
+
+        self.__camera = Camera(size, target, dead_zone, smoothing)
+
+    def camera(self):
+        """FD.camera() -> the Camera used by the Director"""
+
+        return self.__camera
+
+    def orchestrate(self, dt, event, stage, levels, options):
+
+        self.__camera.update(dt, stage)
+
+    def viewport(self, stage, alpha=1):
+
+        return self.__camera.viewport(stage, alpha)
@@ -20,9 +20,10 @@
 
 import logging
 
-from boxes import collide
+from boxes import Box, bounding, intersect
+from spatial import SpatialHash
 
-__all__ = ['DrawingStrategy', 'Everyone', 'DirtyWholes']
+__all__ = ['DrawingStrategy', 'Everyone', 'DirtyWholes', 'RenderIndex']
 
 
 logger = logging.getLogger(__name__)
@@ -30,6 +31,124 @@ logger = logging.getLogger(__name__)
 logger.addHandler(logging.NullHandler())
 
 
+class RenderIndex(object):
+    """RenderIndex(stage[, cell_size]) -> a RenderIndex
+
+    Spatial index over the r_boxes of a Stage's Entities, kept separate from
+    anything physics might use. Each Entity is stored under the box bounding
+    both its past and present r_box, so that both what is and what was visible
+    can be found with a single query.
+
+    Only the Entities the Stage reports as changed get re-indexed.
+    """
+
+    def __init__(self, stage, cell_size=128):
+
+        self.__stage = stage
+        self.__hash = SpatialHash(cell_size)
+
+        # Entities whose index entries might be stale
+        self.__restless = set()
+
+        # Entities that changed since the last refresh
+        self.__changed = set()
+
+        for entity in stage:
+
+            self.tell_spawned(entity)
+
+        stage.add_spawn_observer(self)
+        stage.add_death_observer(self)
+        stage.add_change_observer(self)
+
+    def __extent(self, entity):
+
+        return bounding(entity.past().r_box(), entity.present().r_box())
+
+    def stage(self):
+        """RI.stage() -> the indexed Stage"""
+
+        return self.__stage
+
+    def tell_spawned(self, entity):
+
+        self.__hash.insert(entity, self.__extent(entity))
+
+    def tell_is_dead(self, entity):
+
+        self.__hash.discard(entity)
+
+        self.__restless.discard(entity)
+        self.__changed.discard(entity)
+
+    def tell_changed(self, entity):
+
+        self.__restless.add(entity)
+        self.__changed.add(entity)
+
+    def refresh(self):
+        """RI.refresh() -> set of Entities
+
+        Re-indexes the Entities that changed and returns those that did so
+        since the last refresh.
+        """
+
+        settled = set()
+
+        for entity in self.__restless:
+
+            self.__hash.update(entity, self.__extent(entity))
+
+            if entity.present().r_box() == entity.past().r_box():
+
+                settled.add(entity)
+
+        self.__restless.difference_update(settled)
+
+        changed, self.__changed = self.__changed, set()
+
+        return changed
+
+    def near(self, box):
+        """RI.near(box) -> set of Entities
+
+        Finds the Entities whose past or present r_box might touch the box.
+        """
+
+        return self.__hash.query(box)
+
+    def visible(self, viewport):
+        """RI.visible(viewport) -> set of Entities
+
+        Finds the Entities that are or were visible in the viewport.
+        """
+
+        return set(entity
+                   for entity in self.__hash.query(viewport)
+                   if intersect(entity.present().r_box(), viewport) or
+                   intersect(entity.past().r_box(), viewport))
+
+    def ordered(self, entities):
+        """RI.ordered(entities) -> list of Entities
+
+        Sorts the Entities in the order they should be drawn.
+        """
+
+        return sorted(entities, key=self.__stage.order)
+
+    def in_view(self, viewport, alpha=1):
+        """RI.in_view(viewport[, alpha]) -> list of Entities
+
+        Finds the Entities visible in the viewport when drawn alpha of the way
+        between their past and present r_boxes, in the order they should be
+        drawn.
+        """
+
+        return self.ordered(entity
+                            for entity in self.near(viewport)
+                            if intersect(entity.r_box_at(alpha), viewport))
+
+
 class DrawingStrategy(object):
     """Base class for objects deciding what exactly to draw during a rendering
     pass.
@@ -44,10 +163,24 @@ class DrawingStrategy(object):
 
         raise NotImplementedError()
 
-    def render(self, stage, engine, viewport):
-        """DS.render(stage, engine, viewport)
+    def force_sprites(self, sprite_names):
+        """DS.force_sprites(sprite_names)
+
+        Forces the visible entities showing any of the named sprites to be
+        drawn once, eg. after the sprites got reloaded.
+
+        The default implementation forces all visible entities to be drawn.
+        """
+
+        self.force_all()
+
+    def render(self, stage, engine, viewport, alpha=1):
+        """DS.render(stage, engine, viewport[, alpha])
 
         Renders the visible part of the stage using the viewport.
+
+        Entities are drawn alpha of the way between their past and present
+        r_boxes, see Entity.r_box_at.
         """
 
         raise NotImplementedError()
@@ -62,66 +195,148 @@ class Everyone(DrawingStrategy):
 
         logger.warning('DrawingStrategies are soon to be deprecated!')
 
+        self.__index = None
+
     def force_all(self):
 
         pass
 
-    def render(self, stage, engine, viewport):
+    def render(self, stage, engine, viewport, alpha=1):
 
-        for entity in stage:
+        if self.__index is None or self.__index.stage() is not stage:
+
+            self.__index = RenderIndex(stage)
+
+        index = self.__index
 
-            if collide(entity.present().r_box(), viewport):
+        index.refresh()
 
-                entity.draw(engine, viewport)
+        for entity in index.in_view(viewport, alpha):
+
+            entity.draw(engine, viewport, alpha)
 
 
 class DirtyWholes(DrawingStrategy):
     """Drawing strategy that doesn't redraw Entities which don't have to be
-    redrawn."""
+    redrawn.
+
+    It remembers where each Entity was last drawn, so it works just as well
+    when Entities are drawn in between their states, or when several physics
+    steps (or none) happen between frames.
+    """
 
     def __init__(self):
 
         logger.warning('DrawingStrategies are soon to be deprecated!')
 
-        self.__active_stage_id = id(None)
+        self.__index = None
 
-        self.__dirty = set()
-        self.__drawn = set()
+        # Where the Entities were last drawn, and the boxes of the dead to be
+        # painted over
+        self.__drawn = SpatialHash()
+        self.__dead = []
 
         self.__force_all = False
+        self.__forced_sprites = set()
+
+        self.__viewport = None
 
     def tell_is_dead(self, entity):
 
-        self.__dirty.add(entity)
-        self.__mark_drawn(entity, False)
+        if entity in self.__drawn:
+
+            self.__dead.append(self.__drawn.box(entity))
+
+            self.__drawn.remove(entity)
 
     def force_all(self):
 
         self.__force_all = True
 
-    def __was_drawn(self, entity):
+    def force_sprites(self, sprite_names):
 
-        return entity in self.__drawn
+        self.__forced_sprites.update(sprite_names)
 
-    def __mark_drawn(self, entity, dont_flip=True):
+    def __scroll(self, engine, viewport):
+        """DW.__scroll(engine, viewport) -> list of Boxes
 
-        if dont_flip and entity in self.__drawn:
+        Reuses what is already on screen when the viewport moved, by making the
+        engine scroll it. Returns the parts of the viewport that got exposed
+        and have to be drawn anew.
+        """
 
-            self.__drawn.remove(entity)
+        old = self.__viewport
+        self.__viewport = (viewport.x, viewport.y, viewport.w, viewport.h)
 
-        else:
+        if old is None or old == self.__viewport:
+
+            return []
+
+        x, y, w, h = old
+        dx, dy = viewport.x - x, viewport.y - y
+
+        # Nothing can be reused after a resize or a jump by a whole screen
+        if (w, h) != (viewport.w, viewport.h) or abs(dx) >= w or abs(dy) >= h:
+
+            self.force_all()
+
+            return []
+
+        engine.scroll(dx, dy)
+
+        logger.debug('Viewport scrolled by (%d, %d)', dx, dy)
+
+        strips = []
+
+        if dx > 0:
+
+            strips.append(Box(viewport.x + viewport.w - dx, viewport.y,
+                              dx, viewport.h))
+
+        elif dx < 0:
+
+            strips.append(Box(viewport.x, viewport.y, -dx, viewport.h))
+
+        if dy > 0:
+
+            strips.append(Box(viewport.x, viewport.y + viewport.h - dy,
+                              viewport.w, dy))
+
+        elif dy < 0:
 
-            self.__drawn.add(entity)
+            strips.append(Box(viewport.x, viewport.y, viewport.w, -dy))
 
-    def __is_dirty(self, entity, viewport, others=set()):
+        return strips
 
-        on_screen = collide(
-            entity.present().r_box(),
-            viewport)
+    def __is_exposed(self, box, strips):
 
-        was_on_screen = collide(
-            entity.past().r_box(),
-            viewport)
+        for strip in strips:
+
+            if intersect(box, strip):
+
+                return True
+
+        return False
+
+    def __is_dirty(self, entity, box, viewport, changed):
+        """DW.__is_dirty(entity, box, viewport, changed) -> bool
+
+        Tells whether the entity, to be shown at the box, has to be redrawn.
+        """
+
+        on_screen = intersect(box, viewport)
+
+        if entity in self.__drawn:
+
+            old = self.__drawn.box(entity)
+
+            was_on_screen = intersect(old, viewport)
+
+        else:
+
+            old = None
+
+            was_on_screen = False
 
         # Thing that are and were on screen have quite a couple of rules...
         if on_screen and was_on_screen:
@@ -131,87 +346,88 @@ class DirtyWholes(DrawingStrategy):
 
                 return True
 
-            # Force the drawing of new Entities first time they apppear on
-            # screen
-            if not self.__was_drawn(entity):
-
-                self.__mark_drawn(entity)
+            if (self.__forced_sprites and
+                    not self.__forced_sprites.isdisjoint(
+                        entity.sprite_names())):
 
                 return True
 
-            # See if a redraw is necessary due to changes in the entity itentity
-            moved = entity.present().r_box() != entity.past().r_box()
+            # Moved since the last time it was drawn
+            if box != old:
 
-            sprite_changed = \
-                entity.present().state_name() != entity.past().state_name()
-
-            if moved or sprite_changed:
                 return True
 
-            # See if a redraw is necessary due to changes around the entity
-            for other in others:
+            # See if a redraw is necessary due to changes in the entity itself
+            return entity in changed
 
-                collided = collide(
-                    entity.past().r_box(),
-                    other.past().r_box())
+        # Entities that change their onscreen status are dirty
+        return on_screen != was_on_screen
 
-                collide_now = collide(
-                    entity.present().r_box(),
-                    other.present().r_box())
+    def render(self, stage, engine, viewport, alpha=1):
 
-                if collided or collide_now:
-                    return True
+        if self.__index is None or self.__index.stage() is not stage:
 
-        # Entities that change their onscreen status are dirty
-        elif on_screen != was_on_screen:
+            stage.add_death_observer(self)
 
-            return True
+            self.__index = RenderIndex(stage)
+            self.__drawn.clear()
+            del self.__dead[:]
 
-        return False
+        index = self.__index
+        drawn = self.__drawn
 
-    def render(self, stage, engine, viewport):
+        changed = index.refresh()
 
-        if id(stage) != self.__active_stage_id:
+        strips = self.__scroll(engine, viewport)
 
-            stage.add_death_observer(self)
-            self.__active_stage_id = id(stage)
+        # Where to show each candidate, and which areas have to be repainted
+        shown, dirty, areas = {}, set(), list(self.__dead)
 
-        dirty, maybe = self.__dirty, set()
+        for entity in index.visible(viewport) | drawn.query(viewport):
 
-        for entity in stage:
+            box = shown[entity] = entity.r_box_at(alpha)
 
-            if self.__is_dirty(entity, viewport):
+            if (self.__is_dirty(entity, box, viewport, changed) or
+                    self.__is_exposed(box, strips)):
 
                 dirty.add(entity)
 
-            else:
+                areas.append(box)
 
-                maybe.add(entity)
+                if entity in drawn:
 
-        # Find all those who need redraw amongst those who might
-        any_new = True
+                    areas.append(drawn.box(entity))
 
-        while any_new:
+        # Find all those who need redraw because of the others
+        #
+        # The Entities which are not dirty are shown where they were drawn, so
+        # it is enough to look them up among the drawn
+        while areas:
 
-            any_new = False
+            area = areas.pop()
 
-            for entity in maybe:
+            for entity in drawn.query(area):
 
-                if self.__is_dirty(entity, viewport, dirty):
+                if entity in dirty:
 
-                    dirty.add(entity)
+                    continue
 
-                    any_new = True
+                box = drawn.box(entity)
 
-            maybe.difference_update(dirty)
+                if intersect(box, viewport) and intersect(box, area):
+
+                    dirty.add(entity)
+
+                    areas.append(box)
 
         # Redraw only those who need it
-        for entity in stage:
+        for entity in index.ordered(dirty):
 
-            if entity in dirty:
+            entity.draw(engine, viewport, alpha)
 
-                entity.draw(engine, viewport)
+            drawn.update(entity, shown[entity])
 
         # Clear up
-        self.__dirty.clear()
+        del self.__dead[:]
         self.__force_all = False
+        self.__forced_sprites.clear()
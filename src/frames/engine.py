@@ -90,20 +90,32 @@ class Engine(object):
     def dt(self):
         return time.time() - self.__prev
 
+    def time_left(self):
+        """E.time_left() -> milliseconds or None
+
+        How long until the current frame is due to end, if the Engine knows.
+
+        The default implementation doesn't.
+        """
+
+        return None
+
     def input(self):
         """E.input() -> an Event or None"""
 
         return None
 
     # Rendering
-    def draw(self, pos, sprite_name, rect=None):
-        """E.draw((x, y), sprite_name[, (x_sub, y_sub, w_sub, h_sub)])
+    def draw(self, pos, sprite_name, viewport, region=None):
+        """E.draw((x, y), sprite_name, viewport[, (x_sub, y_sub, w_sub,
+        h_sub)])
 
         Draws the sprite named sprite_name at the (x, y) coordinates of the
-        window.
+        stage, as seen through the viewport Box.
 
         The optional four element tuple describes which subset of the sprite to
-        draw. When not specified, the whole sprite is drawn.
+        draw, in the sprite's own pixels. When not specified, the whole sprite
+        is drawn.
 
         The coordinates are standard Cartesian. It's the Engine's job to
         transform them to the underlying coordinate system used by the
@@ -112,6 +124,49 @@ class Engine(object):
 
         raise NotImplementedError()
 
+    def scroll(self, dx, dy):
+        """E.scroll(dx, dy)
+
+        Shifts whatever was drawn on screen so far by the opposite of the
+        viewport's movement (dx, dy), given in stage units. Lets drawing
+        strategies redraw only the newly exposed parts of the screen when the
+        camera moves.
+        """
+
+        raise NotImplementedError()
+
+    def preload(self, sprite_names):
+        """E.preload(sprite_names)
+
+        Prepare the named sprites before they get drawn for the first time.
+
+        The default implementation does nothing.
+        """
+
+        pass
+
+    def load_mask(self, sprite_name, region=None):
+        """E.load_mask(sprite_name[, region]) -> a collision mask or None
+
+        Return a bitmask of the sprite's opaque pixels, or those of its
+        (x, y, w, h) region, for precise collision checks.
+
+        The default implementation has no masks.
+        """
+
+        return None
+
+    def changed_sprites(self):
+        """E.changed_sprites() -> set of sprite names
+
+        Reload the sprites that changed since the last call, returning their
+        names.
+
+        The default implementation never notices any changes.
+        """
+
+        return set()
+
     # Extra operations
     def update(self):
         """E.update()
@@ -123,6 +178,16 @@ class Engine(object):
 
         self.__prev = time.time()
 
+    def close(self):
+        """E.close()
+
+        Release whatever the engine holds on to, once the Game is over.
+
+        The default implementation does nothing.
+        """
+
+        pass
+
     def options(self):
         """E.options() -> an Options object
 
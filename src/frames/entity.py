@@ -20,9 +20,9 @@
 
 import logging
 
-from boxes import Box
+from boxes import Box, lerp
 
-__all__ = ['Entity']
+__all__ = ['Entity', 'StateWrapper']
 
 
 logger = logging.getLogger(__name__)
@@ -67,15 +67,45 @@ class StateWrapper(object):
 
         return self.__state.dead
 
+    def clip(self):
+
+        return self.__state.clip
+
+    def frame(self):
+
+        return self.__state.frame
+
+    def shown(self):
+        """SW.shown() -> (sprite_name, region)
+
+        What the state shows: the sprite named after it, or the current frame
+        of its clip as the sheet and (x, y, w, h) region of it. The region is
+        None for whole sprites.
+        """
+
+        if self.__state.sheet is None:
+
+            return self.__state.state, None
+
+        return self.__state.sheet, self.__state.region
+
 
 class Entity(object):
-    """Entity class, used to represent all in-game objects."""
+    """Entity class, used to represent all in-game objects.
+
+    Entities show the sprite named after their state, unless their state
+    has a clip ID set, in which case the current frame of the clip from the
+    Behaviour's ClipLibrary (see Behaviour.clips) is shown. The sheet and
+    region of that frame are kept in the state, see StateWrapper.shown.
+    """
 
     def __init__(self, pos, b_box, r_box, state, behaviour,
-                 wrapper=StateWrapper):
+                 wrapper=StateWrapper, tags=()):
 
         # Initialise the fields
         self.__behaviour = behaviour
+        self.__clips = behaviour.clips()
+        self.__tags = frozenset(tags)
 
         self.__next = State()
         self.__curr = State()
@@ -95,6 +125,12 @@ class Entity(object):
 
             st.v = (0, 0)
 
+            st.clip = None
+            st.clip_time = 0
+            st.frame = 0
+            st.sheet = None
+            st.region = None
+
             st.b_box = Box(x, y, *b_box)
             st.r_box = Box(x, y, *r_box)
 
@@ -124,6 +160,11 @@ class Entity(object):
 
         return self.__prev_wrap
 
+    def tags(self):
+        """E.tags() -> frozenset of tag strings"""
+
+        return self.__tags
+
     # Behaviour
     def decide(self, dt, event, stage, hint):
         """E.decide(dt, event, stage, hint)
@@ -136,6 +177,33 @@ class Entity(object):
             stage, hint,
             self.__prev, self.__curr, self.__next)
 
+    def tiers(self):
+        """E.tiers() -> the update tiers of the Behaviour, see Behaviour.tiers
+        """
+
+        return self.__behaviour.tiers()
+
+    def advance(self, dt, steps, event, stage, hint):
+        """E.advance(dt, steps, event, stage, hint)
+
+        Decide what to do to make up for steps steps of length dt.
+        """
+
+        self.__behaviour.advance(
+            dt, steps, event,
+            stage, hint,
+            self.__prev, self.__curr, self.__next)
+
+    def tell_contact(self, kind, other, stage):
+        """E.tell_contact(kind, other, stage)
+
+        Passes a contact event on to the Behaviour.
+        """
+
+        self.__behaviour.contact(
+            kind, other, stage,
+            self.__prev, self.__curr, self.__next)
+
     def act(self):
         """E.act()
 
@@ -153,19 +221,61 @@ class Entity(object):
             self.__curr_wrap)
 
     # Rendering
-    def draw(self, engine, viewport):
-        """E.draw(engine, viewport)
+    def sprite_name(self):
+        """E.sprite_name() -> name of the sprite currently shown"""
+
+        return self.present().shown()[0]
+
+    def sprite_names(self):
+        """E.sprite_names() -> set of the names of sprites the Entity shows
+
+        Those are the sprite shown now and the sheets of all the clips it may
+        play.
+        """
+
+        names = set([self.sprite_name()])
+
+        if self.__clips is not None:
+
+            names.update(self.__clips.sheets())
+
+        return names
+
+    def r_box_at(self, alpha):
+        """E.r_box_at(alpha) -> a Box
+
+        The r_box alpha of the way from the past to the present state.
+        """
+
+        past, present = self.past().r_box(), self.present().r_box()
+
+        if alpha >= 1 or past == present:
+
+            return present
+
+        return lerp(past, present, alpha)
+
+    def draw(self, engine, viewport, alpha=1):
+        """E.draw(engine, viewport[, alpha])
 
         Given an Engine and a Box describing the viewport, draws itself.
+
+        With alpha less than 1 it is drawn in between its past and present
+        positions, see r_box_at. The sprite is always the present one.
         """
 
-        r_box = self.present().r_box()
+        present = self.present()
+
+        r_box = self.r_box_at(alpha)
 
         pos = (r_box.x, r_box.y)
 
+        sprite_name, region = present.shown()
+
         engine.draw(
             pos,
-            self.present().state_name(),
-            viewport)
+            sprite_name,
+            viewport,
+            region)
 
         self.__was_drawn = True
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2012-2013 Karol Marcjan and Bartosz Boguniewicz
+#
+# This file is part of Quantee.
+#
+# Foobar is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Foobar is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import logging
+
+__all__ = ['LifecycleEvent', 'LifecycleBus',
+           'SPAWNED', 'DIED', 'LAYER_CHANGED', 'STATE_CHANGED']
+
+
+logger = logging.getLogger(__name__)
+
+logger.addHandler(logging.NullHandler())
+
+
+SPAWNED = 'spawned'
+DIED = 'died'
+LAYER_CHANGED = 'layer changed'
+STATE_CHANGED = 'state changed'
+
+
+class LifecycleEvent(object):
+    """LifecycleEvent(kind, entity[, detail]) -> a LifecycleEvent
+
+    Something that happened to an Entity during a step. The detail depends on
+    the kind:
+
+      * SPAWNED -- the name of the layer the Entity was spawned in
+
+      * DIED -- None
+
+      * LAYER_CHANGED -- the (old, new) layer names
+
+      * STATE_CHANGED -- the (old, new) state names
+    """
+
+    def __init__(self, kind, entity, detail=None):
+
+        self.__kind = kind
+        self.__entity = entity
+        self.__detail = detail
+
+    def kind(self):
+
+        return self.__kind
+
+    def entity(self):
+
+        return self.__entity
+
+    def detail(self):
+
+        return self.__detail
+
+
+class Subscription(object):
+    """Subscription(observer, kinds, entity, cls, tag) -> a Subscription
+
+    Remembers what events an observer wants to hear about. None stands for
+    any.
+    """
+
+    def __init__(self, observer, kinds, entity, cls, tag):
+
+        self.observer = observer
+
+        self.kinds = None if kinds is None else frozenset(kinds)
+        self.entity = entity
+        self.cls = cls
+        self.tag = tag
+
+    def wants(self, event):
+
+        entity = event.entity()
+
+        return ((self.kinds is None or event.kind() in self.kinds) and
+                (self.entity is None or entity is self.entity) and
+                (self.cls is None or isinstance(entity, self.cls)) and
+                (self.tag is None or self.tag in entity.tags()))
+
+
+class LifecycleBus(object):
+    """LifecycleBus() -> an empty LifecycleBus
+
+    Collects lifecycle events during a step and hands them out in one batch
+    per observer when flushed. Events nobody subscribed to are not even
+    recorded.
+    """
+
+    def __init__(self):
+
+        self.__queue = []
+
+        self.__by_entity = {}
+        self.__general = []
+
+    def subscribe(self, observer, kinds=None, entity=None, cls=None,
+                  tag=None):
+        """LB.subscribe(observer[, kinds[, entity[, cls[, tag]]]])
+
+        From now on, tell the observer about events of the given kinds
+        happening to the given entity, any entity of the class cls or any
+        entity with the tag. Leaving out a filter means not filtering on it.
+
+        Subscriptions to a single entity end once its death got delivered.
+
+        Observers get told through their tell_events(stage, events) method.
+        """
+
+        subscription = Subscription(observer, kinds, entity, cls, tag)
+
+        if entity is None:
+
+            self.__general.append(subscription)
+
+        else:
+
+            self.__by_entity.setdefault(entity, []).append(subscription)
+
+        logger.info('%s subscribed to lifecycle events', observer)
+
+    def post(self, kind, entity, detail=None):
+        """LB.post(kind, entity[, detail])
+
+        Records an event, to be delivered on the next flush.
+        """
+
+        if self.__general or entity in self.__by_entity:
+
+            self.__queue.append(LifecycleEvent(kind, entity, detail))
+
+    def flush(self, stage):
+        """LB.flush(stage)
+
+        Delivers the recorded events.
+        """
+
+        if not self.__queue:
+
+            return
+
+        queue, self.__queue = self.__queue, []
+
+        observers, batches = [], {}
+
+        for event in queue:
+
+            for subscription in (self.__by_entity.get(event.entity(), []) +
+                                 self.__general):
+
+                if subscription.wants(event):
+
+                    key = id(subscription.observer)
+
+                    if key not in batches:
+
+                        observers.append(subscription.observer)
+                        batches[key] = []
+
+                    batches[key].append(event)
+
+        for observer in observers:
+
+            observer.tell_events(stage, batches[id(observer)])
+
+        # Nothing more is going to happen to the dead
+        for event in queue:
+
+            if event.kind() == DIED:
+
+                self.__by_entity.pop(event.entity(), None)
@@ -19,6 +19,11 @@
 
 import logging
 
+from timeit import default_timer
+
+from scheduler import FixedStep
+from tasks import Tasks
+
 __all__ = ['Game']
 
 
@@ -28,23 +33,56 @@ logger.addHandler(logging.NullHandler())
 
 
 class Game(object):
-    """Base class for games."""
+    """Game(engine, drawing_strategy, init_level[, timestep[,
+            max_steps_per_render[, max_frame_time[, interpolate[,
+            governor[, collector]]]]]]) -> a Game
+
+    Base class for games.
+
+    Physics run in fixed steps of timestep milliseconds, see FixedStep.
+
+    With interpolate set, frames show the Entities in between their last two
+    physics states, as far as the time left in the scheduler goes. Motion is
+    then smooth even with physics running slower than rendering, at the cost
+    of lagging a step behind.
+
+    A Governor, when given, gets told how long each frame took and may lower
+    the quality to keep up.
+
+    A Collector, when given, takes garbage collection over while the Game
+    runs, collecting in the time left at the end of frames.
+
+    Work that can wait goes to the Game's Tasks, which get the time left
+    after that. Whatever is left of them when the Game ends is finished
+    then.
+    """
 
-    def __init__(self, engine, drawing_strategy, init_level, timestep=1000 /
-                 60, max_steps_per_render=100):
+    def __init__(self, engine, drawing_strategy, init_level,
+                 timestep=1000.0 / 60, max_steps_per_render=5,
+                 max_frame_time=250, interpolate=False, governor=None,
+                 collector=None):
 
         self.__engine = engine
         self.__drawing_strategy = drawing_strategy
 
-        self.__timestep = timestep
-        self.__max_steps_per_render = max_steps_per_render
-        self.__time_left = 0
+        self.__scheduler = FixedStep(timestep, max_steps_per_render,
+                                     max_frame_time)
+
+        self.__interpolate = interpolate
+
+        self.__offscreen_slowdown = 1
+
+        self.__governor = governor
+        self.__frame_started = None
+
+        self.__collector = collector
+
+        self.__tasks = Tasks()
 
         self.__levels = [init_level]
+        self.__preloaded = None
 
         logger.info('Game created')
-        logger.info('Steps per render limited to %d', max_steps_per_render)
-        logger.info('Physics time step is %d', timestep)
 
     def __levels_left(self):
 
@@ -54,44 +92,165 @@ class Game(object):
 
         return left
 
+    def scheduler(self):
+
+        return self.__scheduler
+
+    def tasks(self):
+        """G.tasks() -> the Tasks run in idle time"""
+
+        return self.__tasks
+
+    def playing(self):
+        """G.playing() -> whether there are any levels left"""
+
+        return self.__levels_left() > 0
+
+    def engine(self):
+
+        return self.__engine
+
+    def level(self):
+        """G.level() -> the current Level"""
+
+        return self.__levels[-1]
+
+    def drawing_strategy(self):
+
+        return self.__drawing_strategy
+
+    def set_drawing_strategy(self, strategy):
+        """G.set_drawing_strategy(strategy)
+
+        Draws with another DrawingStrategy from the next frame on.
+        """
+
+        self.__drawing_strategy = strategy
+
+        # It doesn't know what is on screen
+        strategy.force_all()
+
+        logger.info('Drawing strategy changed to %s', strategy)
+
+    def interpolates(self):
+
+        return self.__interpolate
+
+    def set_interpolation(self, interpolate):
+
+        self.__interpolate = interpolate
+
+        logger.info('Interpolation %s', 'on' if interpolate else 'off')
+
+    def offscreen_slowdown(self):
+
+        return self.__offscreen_slowdown
+
+    def set_offscreen_slowdown(self, slowdown):
+        """G.set_offscreen_slowdown(slowdown)
+
+        Has every Level, including those pushed later, update its off-screen
+        Entities slowdown times less often, see UpdateTiers.set_slowdown.
+        """
+
+        self.__offscreen_slowdown = slowdown
+
     def step_physics(self):
         """G.step_physics()
 
-        Advances logical game time.
+        Advances logical game time by one step.
         """
 
         event = self.__engine.input()
 
         logger.info('Performing physics steps')
 
+        tiers = self.__levels[-1].tiers()
+
+        # Each Level has UpdateTiers of its own
+        if tiers.slowdown() != self.__offscreen_slowdown:
+
+            tiers.set_slowdown(self.__offscreen_slowdown)
+
         self.__levels[-1].step(
-            self.__timestep,
+            self.__scheduler.timestep(),
             event,
             self.__levels,
             self.__engine.options())
 
-        self.__steps_in_frame += 1
+        self.__scheduler.consume()
 
-        self.__time_left -= self.__timestep
+    def multistep_physics(self, frame_time):
+        """G.multistep_physics(frame_time)
 
-    def multistep_physics(self):
-        """G.multistep_physics()
+        Performs as many logical steps as the frame_time is worth, within the
+        scheduler's budget.
 
+        Stops 'early' if no more levels are left after one of the steps.
+        """
 
-        Perform enough logical steps of the game to cover the rendering time.
+        steps = self.__scheduler.advance(frame_time)
 
-        Stops 'early' if no more levels are left after one of the steps.
+        logger.info('Making %d physics steps', steps)
+
+        for _ in range(steps):
+
+            if not self.__levels_left():
+
+                break
+
+            self.step_physics()
+
+    def preload(self):
+        """G.preload()
+
+        Has the engine prepare the sprites of the current level, unless it
+        already did.
         """
 
-        self.__steps_in_frame = 0
+        level = self.__levels[-1]
+
+        if level is not self.__preloaded:
+
+            logger.info('Preloading the sprites of a new level')
+
+            level.prepare(self.__engine)
+
+            self.__engine.preload(level.sprite_names())
 
-        logger.info('The time accumulator is %f', self.__time_left)
+            self.__preloaded = level
 
-        while (self.__time_left >= self.__last_frame and
-                self.__steps_in_frame < self.__max_steps_per_render and
-                self.__levels_left()):
+            # Whatever is there now is going to last
+            if self.__collector is not None:
 
-                self.step_physics()
+                self.__collector.freeze()
+
+    def begin_frame(self):
+        """G.begin_frame()
+
+        Gets ready to draw a frame: forces redraws where needed and preloads
+        the sprites of a new level.
+        """
+
+        # When resolutions change everything is dirty
+        if self.__engine.options().screen_changed():
+
+            logger.warning('Deprecated! Forcing redraw of all Entities '
+                           'after resolution change')
+
+            self.__drawing_strategy.force_all()
+
+        # Show the sprites that changed on disk
+        changed = self.__engine.changed_sprites()
+
+        if changed:
+
+            logger.info('Redrawing reloaded sprites: %s', changed)
+
+            self.__drawing_strategy.force_sprites(changed)
+
+        # Get the sprites ready before a new level is first drawn
+        self.preload()
 
     def render(self):
         """G.render()
@@ -101,14 +260,107 @@ class Game(object):
 
         logger.info('Drawing a frame')
 
+        alpha = self.__scheduler.alpha() if self.__interpolate else 1
+
         self.__levels[-1].render(
             self.__engine,
-            self.__drawing_strategy)
+            self.__drawing_strategy,
+            alpha)
+
+    def finish_work(self):
+        """G.finish_work() -> the work time or None
+
+        Marks the end of the frame's work, returning how long it took in
+        milliseconds (None for the first frame).
+        """
 
-        self.__last_frame = self.__engine.dt()
-        self.__time_left += self.__last_frame
+        # Everything since the previous frame ended was work
+        if self.__frame_started is None:
+
+            return None
+
+        return (default_timer() - self.__frame_started) * 1000
+
+    def tick(self, work_time):
+        """G.tick(work_time) -> the frame time
+
+        Waits for the frame to end and returns how long it lasted, in
+        milliseconds. The governor is told about it.
+        """
+
+        frame_time = self.__engine.dt()
+
+        logger.info('The frame time was %f', frame_time)
+
+        if work_time is not None and self.__governor is not None:
+
+            self.__governor.observe(self, frame_time, work_time)
+
+        self.__frame_started = default_timer()
+
+        return frame_time
+
+    def update(self):
+        """G.update()
+
+        Lets the engine show the frame.
+        """
 
-        logger.info('The render time was %f', self.__last_frame)
+        logger.info('Calling the Engine\'s update method')
+
+        self.__engine.update()
+
+    def idle(self):
+        """G.idle()
+
+        Does what can wait, in the time left until the frame ends.
+        """
+
+        if self.__collector is not None:
+
+            self.__collector.collect(self.__engine.time_left())
+
+        # Even with nothing to run, so that it counts every frame
+        self.__tasks.run(self.__engine.time_left())
+
+    def start(self):
+        """G.start()
+
+        Called before the first frame.
+        """
+
+        if self.__collector is not None:
+
+            self.__collector.start()
+
+    def stop(self):
+        """G.stop()
+
+        Called after the last frame, or when running failed.
+        """
+
+        if self.__collector is not None:
+
+            self.__collector.stop()
+
+            self.__report_collections()
+
+        logger.info('Scheduler statistics: %s', self.__scheduler.stats())
+
+        self.__engine.close()
+
+    def __report_collections(self):
+
+        stats = self.__collector.stats()
+
+        for generation in sorted(stats):
+
+            logger.info('metric gc generation=%d collections=%d '
+                        'total_ms=%.3f longest_ms=%.3f',
+                        generation,
+                        stats[generation]['collections'],
+                        stats[generation]['total_ms'],
+                        stats[generation]['longest_ms'])
 
     def run(self):
         """G.run()
@@ -116,27 +368,32 @@ class Game(object):
         Run the Game.
         """
 
-        # Prepare for time-handling
-        self.__time_left = 0
+        self.start()
+
+        try:
+
+            # Until the game stops, iterate over the events
+            while self.playing():
+
+                self.begin_frame()
+
+                self.render()
 
-        # Until the game stops, iterate over the events
-        while self.__levels_left():
+                work_time = self.finish_work()
 
-            # When resolutions change everything is dirty
-            if self.__engine.options().screen_changed():
+                # Do what can wait in the time left
+                self.idle()
 
-                logger.warning('Deprecated! Forcing redraw of all Entities '
-                               'after resolution change')
+                # Wait for the frame to end and get the frame time
+                frame_time = self.tick(work_time)
 
-                self.__drawing_strategy.force_all()
+                # Make as many physic steps as necessary
+                self.multistep_physics(frame_time)
 
-            # Render the level and get the render time
-            self.render()
+                self.update()
 
-            # Make as many physic steps as necessary
-            self.multistep_physics()
+            self.__tasks.finish()
 
-            # Let the engine do whatever it needs to
-            logger.info('Calling the Engine\'s update method')
+        finally:
 
-            self.__engine.update()
+            self.stop()
@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2012-2013 Karol Marcjan and Bartosz Boguniewicz
+#
+# This file is part of Quantee.
+#
+# Foobar is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Foobar is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import logging
+
+from collections import deque
+
+__all__ = ['Governor', 'Knob', 'Interpolation', 'Strategy', 'Timestep',
+           'OffscreenUpdates']
+
+
+logger = logging.getLogger(__name__)
+
+logger.addHandler(logging.NullHandler())
+
+
+class Knob(object):
+    """Base class for the ways a Governor can trade quality for time."""
+
+    name = 'knob'
+
+    def degrade(self, game):
+        """K.degrade(game)
+
+        Makes the game cheaper to run.
+        """
+
+        raise NotImplementedError()
+
+    def restore(self, game):
+        """K.restore(game)
+
+        Undoes what degrade did.
+        """
+
+        raise NotImplementedError()
+
+
+class Interpolation(Knob):
+    """Interpolation() -> a Knob turning off interpolated rendering"""
+
+    name = 'interpolation'
+
+    def __init__(self):
+
+        self.__was_on = False
+
+    def degrade(self, game):
+
+        self.__was_on = game.interpolates()
+
+        game.set_interpolation(False)
+
+    def restore(self, game):
+
+        game.set_interpolation(self.__was_on)
+
+
+class Strategy(Knob):
+    """Strategy(cheap) -> a Knob switching to the cheap DrawingStrategy"""
+
+    name = 'strategy'
+
+    def __init__(self, cheap):
+
+        self.__cheap = cheap
+        self.__usual = None
+
+    def degrade(self, game):
+
+        self.__usual = game.drawing_strategy()
+
+        game.set_drawing_strategy(self.__cheap)
+
+    def restore(self, game):
+
+        game.set_drawing_strategy(self.__usual)
+
+
+class Timestep(Knob):
+    """Timestep([factor[, max_timestep]]) -> a Knob making physics steps longer
+
+    The timestep is multiplied by factor, but never made longer than
+    max_timestep milliseconds, past which collisions would get unreliable.
+    """
+
+    name = 'timestep'
+
+    def __init__(self, factor=1.5, max_timestep=1000.0 / 30):
+
+        self.__factor = factor
+        self.__max_timestep = max_timestep
+
+        self.__usual = None
+
+    def degrade(self, game):
+
+        scheduler = game.scheduler()
+
+        self.__usual = scheduler.timestep()
+
+        scheduler.set_timestep(
+            max(self.__usual,
+                min(self.__usual * self.__factor, self.__max_timestep)))
+
+    def restore(self, game):
+
+        game.scheduler().set_timestep(self.__usual)
+
+
+class OffscreenUpdates(Knob):
+    """OffscreenUpdates([factor]) -> a Knob making off-screen updates rarer
+
+    Entities far enough to be in an update tier (see UpdateTiers) are updated
+    factor times less often.
+    """
+
+    name = 'offscreen updates'
+
+    def __init__(self, factor=2):
+
+        self.__factor = factor
+
+    def degrade(self, game):
+
+        game.set_offscreen_slowdown(self.__factor)
+
+    def restore(self, game):
+
+        game.set_offscreen_slowdown(1)
+
+
+class Governor(object):
+    """Governor(budget[, knobs[, window[, high[, low]]]]) -> a Governor
+
+    Watches how long frames take to compute and turns Knobs to keep that
+    within the budget (in milliseconds).
+
+    Every window frames it looks at the mean load, the share of the budget
+    used. Above high, or when physics steps got skipped, the next Knob in the
+    list is degraded. Below low the last degraded one is restored.
+
+    Each decision is logged as a metric line.
+    """
+
+    def __init__(self, budget, knobs=(), window=30, high=0.9, low=0.5):
+
+        self.__budget = float(budget)
+        self.__knobs = list(knobs)
+
+        self.__window = window
+        self.__high = high
+        self.__low = low
+
+        self.__work = deque(maxlen=window)
+        self.__frame = deque(maxlen=window)
+        self.__frames = 0
+
+        self.__skipped = 0
+
+        # How many Knobs are degraded
+        self.__level = 0
+
+    def add_knob(self, knob):
+        """G.add_knob(knob)
+
+        Appends a Knob to be degraded after the others.
+        """
+
+        self.__knobs.append(knob)
+
+    def level(self):
+        """G.level() -> how many Knobs are degraded"""
+
+        return self.__level
+
+    def observe(self, game, frame_time, work_time):
+        """G.observe(game, frame_time, work_time)
+
+        Accounts for a frame that lasted frame_time milliseconds, work_time of
+        them spent computing, and turns a Knob of the game when needed.
+        """
+
+        self.__work.append(work_time)
+        self.__frame.append(frame_time)
+        self.__frames += 1
+
+        if self.__frames < self.__window:
+
+            return
+
+        self.__frames = 0
+
+        skipped = game.scheduler().stats()['skipped_steps']
+        skipping, self.__skipped = skipped > self.__skipped, skipped
+
+        work = sum(self.__work) / len(self.__work)
+        frame = sum(self.__frame) / len(self.__frame)
+        load = work / self.__budget
+
+        if (load > self.__high or skipping) and \
+                self.__level < len(self.__knobs):
+
+            knob = self.__knobs[self.__level]
+
+            knob.degrade(game)
+
+            self.__level += 1
+
+            self.__report('degrade', knob, load, work, frame)
+
+        elif load < self.__low and self.__level > 0 and not skipping:
+
+            self.__level -= 1
+
+            knob = self.__knobs[self.__level]
+
+            knob.restore(game)
+
+            self.__report('restore', knob, load, work, frame)
+
+    def __report(self, action, knob, load, work, frame):
+
+        logger.info('metric governor action=%s knob=%s level=%d load=%.3f '
+                    'work_ms=%.3f frame_ms=%.3f',
+                    action, knob.name, self.__level, load, work, frame)
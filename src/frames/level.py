@@ -20,6 +20,8 @@
 
 import logging
 
+from lod import UpdateTiers
+
 __all__ = ['Level']
 
 
@@ -38,6 +40,22 @@ class Level(object):
         self.__director = director
         self.__stage = stage
 
+        self.__tiers = UpdateTiers(stage)
+
+    def tiers(self):
+        """L.tiers() -> the UpdateTiers deciding who is updated each step"""
+
+        return self.__tiers
+
+    def prepare(self, engine):
+        """L.prepare(engine)
+
+        Called by the Game before the Level is first rendered. Lets the Stage
+        get collision masks from the engine.
+        """
+
+        self.__stage.set_mask_source(engine)
+
     # Game logic
     def step(self, dt, event, levels, options):
         """L.step(dt, event, levels, options)
@@ -45,18 +63,30 @@ class Level(object):
         Performs a logical step.
         """
 
-        for entity in self.__stage:
+        stage = self.__stage
 
-            entity.decide(dt, event,
-                          self.__stage,
-                          self.__director.hints(entity))
+        due = self.__tiers.due(self.__director.viewport(stage))
 
-        for entity in self.__stage:
+        for entity, steps in due:
+
+            if steps == 1:
 
-            entity.act()
+                entity.decide(dt, event,
+                              stage,
+                              self.__director.hints(entity))
+
+            else:
+
+                entity.advance(dt, steps, event,
+                               stage,
+                               self.__director.hints(entity))
+
+        # The Entities left out keep their states as they are
+        stage.act([entity for entity, _ in due])
 
         self.__stage.harvest_dead()
         self.__stage.spawn()
+        self.__stage.flush_events()
 
         self.__director.orchestrate(dt, event,
                                     self.__stage,
@@ -64,14 +94,30 @@ class Level(object):
                                     options)
 
     # Rendering
-    def render(self, engine, strategy):
-        """L.render(engine, strategy)
+    def sprite_names(self):
+        """L.sprite_names() -> set of sprite names
+
+        The sprites the Level is going to need, as told by what the Entities
+        on its Stage show.
+        """
+
+        names = set()
+
+        for entity in self.__stage:
+
+            names.update(entity.sprite_names())
+
+        return names
+
+    def render(self, engine, strategy, alpha=1):
+        """L.render(engine, strategy[, alpha])
 
-        Draw the visible part of the level on screen.
+        Draw the visible part of the level on screen, alpha of the way
+        between the last two physics steps.
         """
 
         stage = self.__stage
 
-        viewport = self.__director.viewport(stage)
+        viewport = self.__director.viewport(stage, alpha)
 
-        strategy.render(stage, engine, viewport)
+        strategy.render(stage, engine, viewport, alpha)
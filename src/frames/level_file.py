@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2012-2013 Karol Marcjan and Bartosz Boguniewicz
+#
+# This file is part of Quantee.
+#
+# Foobar is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Foobar is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import os
+import marshal
+import hashlib
+import logging
+
+from yaml import safe_load
+
+from stage import Stage
+
+__all__ = ['load_level_data', 'build_stage']
+
+
+logger = logging.getLogger(__name__)
+
+logger.addHandler(logging.NullHandler())
+
+
+CACHE_DIR = '.cache'
+
+CACHE_SUFFIX = '.lvlc'
+
+
+def __cache_path(path, source, cache_dir):
+
+    key = hashlib.sha1(source)
+    key.update(str(marshal.version).encode())
+
+    name = '%s.%s%s' % (os.path.basename(path), key.hexdigest(), CACHE_SUFFIX)
+
+    return os.path.join(cache_dir, name)
+
+
+def load_level_data(path, cache_dir=None):
+    """load_level_data(path[, cache_dir]) -> dict
+
+    Reads a YAML level description like
+
+        size: [800, 600]
+        layers: [bg, movers]
+        default_layer: movers
+        entities:
+            - {type: environment, layer: bg, x: 0, y: 0, ...}
+            - {type: star, name: star, x: 710, y: 30}
+
+    A compiled copy is kept in cache_dir (a `.cache` directory next to the
+    file by default), under the hash of the file's contents. As long as the
+    file doesn't change, later loads read the compiled copy and skip parsing
+    the YAML altogether.
+    """
+
+    if cache_dir is None:
+
+        cache_dir = os.path.join(os.path.dirname(path), CACHE_DIR)
+
+    with open(path, 'rb') as level_file:
+
+        source = level_file.read()
+
+    cache_path = __cache_path(path, source, cache_dir)
+
+    if os.path.isfile(cache_path):
+
+        with open(cache_path, 'rb') as cache_file:
+
+            data = marshal.load(cache_file)
+
+        logger.info('Level %s loaded from %s', path, cache_path)
+
+        return data
+
+    data = safe_load(source)
+
+    try:
+
+        if not os.path.isdir(cache_dir):
+
+            os.makedirs(cache_dir)
+
+        # Compiled copies of older versions of the file are of no use
+        prefix = os.path.basename(path) + '.'
+
+        for name in os.listdir(cache_dir):
+
+            if name.startswith(prefix) and name.endswith(CACHE_SUFFIX):
+
+                os.remove(os.path.join(cache_dir, name))
+
+        with open(cache_path, 'wb') as cache_file:
+
+            marshal.dump(data, cache_file)
+
+        logger.info('Level %s compiled to %s', path, cache_path)
+
+    except (IOError, OSError) as error:
+
+        logger.warning('Could not cache level %s: %s', path, error)
+
+    return data
+
+
+def __build(spec, types, nested):
+
+    params = dict(spec)
+
+    kind = params.pop('type')
+    params.pop('layer', None)
+    params.pop('name', None)
+
+    for key, value in params.items():
+
+        if isinstance(value, dict) and 'type' in value:
+
+            params[key] = __build(value, nested, nested)
+
+    return types[kind](**params)
+
+
+def build_stage(data, entity_types, behaviour_types={}):
+    """build_stage(data, entity_types[, behaviour_types]) -> (stage, named)
+
+    Makes a Stage out of level data, with all its Entities spawned.
+
+    Each entity is described by a dictionary whose `type` is looked up in
+    entity_types, a dictionary of callables making Entities. The remaining
+    keys are passed to it as keyword arguments, apart from the optional
+    `layer` and `name`. Arguments that are dictionaries with a `type` of their
+    own are built first, from behaviour_types.
+
+    named maps the names given to entities to the Entities themselves.
+    """
+
+    stage = Stage(tuple(data['size']),
+                  list(data['layers']),
+                  data['default_layer'])
+
+    named = {}
+
+    for spec in data.get('entities', ()):
+
+        entity = __build(spec, entity_types, behaviour_types)
+
+        stage.add_spawn(entity, spec.get('layer'))
+
+        if 'name' in spec:
+
+            named[spec['name']] = entity
+
+    stage.spawn()
+
+    return stage, named
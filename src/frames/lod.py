@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2012-2013 Karol Marcjan and Bartosz Boguniewicz
+#
+# This file is part of Quantee.
+#
+# Foobar is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Foobar is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import logging
+
+from boxes import Box, gap
+
+__all__ = ['UpdateTiers']
+
+
+logger = logging.getLogger(__name__)
+
+logger.addHandler(logging.NullHandler())
+
+
+class UpdateTiers(object):
+    """UpdateTiers(stage) -> an UpdateTiers
+
+    Decides which Entities of the Stage get updated in a step, by how far they
+    are from the viewport.
+
+    Entities whose Behaviours have tiers (see Behaviour.tiers) are put to
+    sleep for k steps once at least the tier's distance away, and make up
+    for the skipped steps all at once when woken (see Entity.advance).
+    Sleeping Entities cost nothing. The rest are updated every step.
+
+    Getting within the first tier's distance of the viewport wakes an Entity
+    right away. As long as that distance is more than the viewport can move
+    in a step, all the catching up happens off screen.
+
+    The slowdown multiplies every k, so that off-screen updates can be made
+    rarer still under load.
+    """
+
+    def __init__(self, stage):
+
+        self.__stage = stage
+
+        self.__step = 0
+
+        # Sleeping Entities and the steps they were last updated on
+        self.__asleep = {}
+
+        # Entities to wake on each step
+        self.__alarms = {}
+
+        # Furthest from the viewport an Entity may need waking early
+        self.__reach = 0
+
+        self.__slowdown = 1
+
+        stage.add_death_observer(self)
+
+    def slowdown(self):
+
+        return self.__slowdown
+
+    def set_slowdown(self, slowdown):
+
+        self.__slowdown = slowdown
+
+        logger.info('Off-screen updates slowed down %d times', slowdown)
+
+    def tell_is_dead(self, entity):
+
+        self.__asleep.pop(entity, None)
+
+    def __every(self, entity, tiers, viewport):
+
+        distance = gap(entity.present().b_box(), viewport)
+
+        every = 1
+
+        for start, k in tiers:
+
+            if distance >= start:
+
+                every = k * self.__slowdown
+
+        return every
+
+    def due(self, viewport):
+        """UT.due(viewport) -> list of (Entity, steps) pairs
+
+        Counts a step and tells which Entities are to be updated, and for how
+        many steps.
+        """
+
+        self.__step += 1
+
+        step = self.__step
+        asleep = self.__asleep
+
+        due = [(entity, 1) for entity in self.__stage if entity not in asleep]
+
+        woken = self.__alarms.pop(step, [])
+
+        # Wake those the viewport got close to
+        if asleep:
+
+            near = Box(viewport.x - self.__reach,
+                       viewport.y - self.__reach,
+                       viewport.w + 2 * self.__reach,
+                       viewport.h + 2 * self.__reach)
+
+            for entity in self.__stage.box_query(near):
+
+                if (entity in asleep and
+                        gap(entity.present().b_box(), viewport) <
+                        entity.tiers()[0][0]):
+
+                    woken.append(entity)
+
+        for entity in woken:
+
+            # Might have been woken early, or died
+            if entity in asleep:
+
+                due.append((entity, step - asleep.pop(entity)))
+
+        # Put to sleep those far enough
+        for entity, _ in due:
+
+            tiers = entity.tiers()
+
+            if not tiers:
+
+                continue
+
+            every = self.__every(entity, tiers, viewport)
+
+            if every > 1:
+
+                asleep[entity] = step
+
+                self.__alarms.setdefault(step + every, []).append(entity)
+
+                self.__reach = max(self.__reach, tiers[0][0])
+
+        return due
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2012-2013 Karol Marcjan and Bartosz Boguniewicz
+#
+# This file is part of Quantee.
+#
+# Foobar is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Foobar is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import logging
+
+__all__ = ['FixedStep']
+
+
+logger = logging.getLogger(__name__)
+
+logger.addHandler(logging.NullHandler())
+
+
+class FixedStep(object):
+    """FixedStep([timestep[, max_steps[, max_frame_time]]]) -> a FixedStep
+
+    A fixed timestep accumulator. Frame times are added up and paid back in
+    physics steps of exactly timestep milliseconds, so the simulation does
+    not depend on the frame rate.
+
+    Under overload the game slows down instead of grinding to a halt:
+
+      * a single frame is never counted as longer than max_frame_time, which
+        keeps a long stall (e.g. a dragged window) from being replayed
+
+      * no more than max_steps steps are made per frame, whatever remains
+        owed beyond that (save for the fraction of a step) is dropped
+
+    Both kinds of dropped time are recorded in stats().
+    """
+
+    def __init__(self, timestep=1000.0 / 60, max_steps=5,
+                 max_frame_time=250):
+
+        if timestep <= 0:
+            raise ValueError('The timestep has to be positive')
+
+        if max_steps < 1:
+            raise ValueError('At least one step per frame has to be allowed')
+
+        self.__timestep = float(timestep)
+        self.__max_steps = max_steps
+        self.__max_frame_time = max_frame_time
+
+        self.__accumulator = 0.0
+
+        self.__frames = 0
+        self.__steps = 0
+        self.__skipped_steps = 0
+        self.__clamped_time = 0.0
+        self.__overloaded_frames = 0
+
+        logger.info('Fixed timestep of %f ms, at most %d steps per frame',
+                    self.__timestep, max_steps)
+
+    def timestep(self):
+
+        return self.__timestep
+
+    def set_timestep(self, timestep):
+        """FS.set_timestep(timestep)
+
+        Changes the length of future steps. The time already accumulated is
+        kept.
+        """
+
+        if timestep <= 0:
+            raise ValueError('The timestep has to be positive')
+
+        self.__timestep = float(timestep)
+
+        logger.info('Timestep changed to %f ms', self.__timestep)
+
+    def max_steps(self):
+
+        return self.__max_steps
+
+    def advance(self, frame_time):
+        """FS.advance(frame_time) -> number of steps to make
+
+        Accounts for a frame that lasted frame_time milliseconds.
+        """
+
+        self.__frames += 1
+
+        if frame_time > self.__max_frame_time:
+
+            logger.warning('Frame of %f ms clamped to %f ms',
+                           frame_time, self.__max_frame_time)
+
+            self.__clamped_time += frame_time - self.__max_frame_time
+
+            frame_time = self.__max_frame_time
+
+        self.__accumulator += frame_time
+
+        owed = int(self.__accumulator // self.__timestep)
+
+        if owed > self.__max_steps:
+
+            skipped = owed - self.__max_steps
+
+            logger.warning('Overloaded, skipping %d physics steps', skipped)
+
+            self.__accumulator -= skipped * self.__timestep
+
+            self.__skipped_steps += skipped
+            self.__overloaded_frames += 1
+
+            owed = self.__max_steps
+
+        return owed
+
+    def consume(self):
+        """FS.consume()
+
+        Pays one step's worth of time off the accumulator. To be called after
+        each step made.
+        """
+
+        self.__accumulator -= self.__timestep
+
+        self.__steps += 1
+
+    def alpha(self):
+        """FS.alpha() -> how far between the last two steps it is now
+
+        It is the fraction of a step left in the accumulator, in [0, 1).
+        """
+
+        return max(0.0, min(self.__accumulator / self.__timestep, 1.0))
+
+    def stats(self):
+        """FS.stats() -> a dict of frame skipping statistics"""
+
+        return dict(frames=self.__frames,
+                    steps=self.__steps,
+                    skipped_steps=self.__skipped_steps,
+                    overloaded_frames=self.__overloaded_frames,
+                    clamped_time=self.__clamped_time)
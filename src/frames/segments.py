@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2012-2013 Karol Marcjan and Bartosz Boguniewicz
+#
+# This file is part of Quantee.
+#
+# Foobar is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Foobar is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import logging
+
+from boxes import Box, intersect
+
+__all__ = ['Segment', 'SegmentTree', 'segments_from_boxes', 'platform',
+           'UP', 'DOWN', 'LEFT', 'RIGHT']
+
+
+logger = logging.getLogger(__name__)
+
+logger.addHandler(logging.NullHandler())
+
+
+UP = (0, 1)
+DOWN = (0, -1)
+LEFT = (-1, 0)
+RIGHT = (1, 0)
+
+
+class Segment(object):
+    """Segment(x0, y0, x1, y1, normal) -> an axis aligned Segment
+
+    An impenetrable line segment, blocking only things coming from the side
+    its normal points to. A segment blocking both ways is a pair of segments
+    with opposite normals; a one-way platform is a single segment facing UP.
+    """
+
+    def __init__(self, x0, y0, x1, y1, normal):
+
+        self.x0, self.x1 = min(x0, x1), max(x0, x1)
+        self.y0, self.y1 = min(y0, y1), max(y0, y1)
+
+        self.normal = normal
+
+    def __str__(self):
+
+        return 'Segment(%d, %d, %d, %d, %s)' % (
+            self.x0, self.y0, self.x1, self.y1, self.normal)
+
+    def box(self):
+        """S.box() -> a (flat) Box covering the segment"""
+
+        return Box(self.x0, self.y0, self.x1 - self.x0, self.y1 - self.y0)
+
+
+def platform(x, y, w):
+    """platform(x, y, w) -> a Segment
+
+    A one-way platform, which can be jumped through from below.
+    """
+
+    return Segment(x, y, x + w, y, UP)
+
+
+def __union(intervals):
+
+    merged = []
+
+    for start, end in sorted(intervals):
+
+        if merged and start <= merged[-1][1]:
+
+            merged[-1][1] = max(merged[-1][1], end)
+
+        else:
+
+            merged.append([start, end])
+
+    return merged
+
+
+def __subtract(intervals, cuts):
+
+    result = []
+
+    for start, end in intervals:
+
+        pieces = [(start, end)]
+
+        for cut_start, cut_end in cuts:
+
+            left = []
+
+            for p_start, p_end in pieces:
+
+                if cut_end <= p_start or cut_start >= p_end:
+
+                    left.append((p_start, p_end))
+
+                    continue
+
+                if p_start < cut_start:
+
+                    left.append((p_start, cut_start))
+
+                if cut_end < p_end:
+
+                    left.append((cut_end, p_end))
+
+            pieces = left
+
+        result.extend(pieces)
+
+    return result
+
+
+def __faces(facing, opposite, make):
+    """Turns faces into segments, dropping the parts covered by faces of
+    neighbouring boxes looking the other way."""
+
+    segments = []
+
+    for line in facing:
+
+        cuts = __union(opposite.get(line, []))
+
+        for start, end in __union(__subtract(__union(facing[line]), cuts)):
+
+            segments.append(make(line, start, end))
+
+    return segments
+
+
+def segments_from_boxes(boxes):
+    """segments_from_boxes(boxes) -> list of Segments
+
+    Outlines a set of obstacle boxes. Faces shared by touching boxes (like
+    the seams between neighbouring blocks) are dropped and collinear faces
+    are merged into single segments.
+    """
+
+    tops, bottoms, lefts, rights = {}, {}, {}, {}
+
+    for box in boxes:
+
+        tops.setdefault(box.y + box.h, []).append((box.x, box.x + box.w))
+        bottoms.setdefault(box.y, []).append((box.x, box.x + box.w))
+
+        lefts.setdefault(box.x, []).append((box.y, box.y + box.h))
+        rights.setdefault(box.x + box.w, []).append((box.y, box.y + box.h))
+
+    segments = (
+        __faces(tops, bottoms, lambda y, a, b: Segment(a, y, b, y, UP)) +
+        __faces(bottoms, tops, lambda y, a, b: Segment(a, y, b, y, DOWN)) +
+        __faces(lefts, rights, lambda x, a, b: Segment(x, a, x, b, LEFT)) +
+        __faces(rights, lefts, lambda x, a, b: Segment(x, a, x, b, RIGHT)))
+
+    logger.info('%d obstacle boxes outlined with %d segments',
+                len(boxes),
+                len(segments))
+
+    return segments
+
+
+class SegmentTree(object):
+    """SegmentTree(segments[, leaf_size]) -> a SegmentTree
+
+    Static bounding volume hierarchy over Segments. Built once, it finds the
+    segments near a box (eg. the one swept by a moving character) while
+    skipping whole subtrees of far away ones.
+    """
+
+    def __init__(self, segments, leaf_size=4):
+
+        self.__leaf_size = leaf_size
+        self.__segments = list(segments)
+
+        self.__root = self.__build(self.__segments) if segments else None
+
+    def __len__(self):
+        """ST.__len__() <=> len(ST)"""
+
+        return len(self.__segments)
+
+    def __iter__(self):
+        """ST.__iter__() <=> iter(ST)"""
+
+        return iter(self.__segments)
+
+    def __build(self, segments):
+        """ST.__build(segments) -> (box, children, segments)"""
+
+        x0 = min(segment.x0 for segment in segments)
+        y0 = min(segment.y0 for segment in segments)
+        x1 = max(segment.x1 for segment in segments)
+        y1 = max(segment.y1 for segment in segments)
+
+        box = Box(x0, y0, x1 - x0, y1 - y0)
+
+        if len(segments) <= self.__leaf_size:
+
+            return (box, (), segments)
+
+        # Split at the median along the longer side
+        if box.w >= box.h:
+
+            def key(segment):
+
+                return segment.x0 + segment.x1
+
+        else:
+
+            def key(segment):
+
+                return segment.y0 + segment.y1
+
+        segments = sorted(segments, key=key)
+        half = len(segments) // 2
+
+        children = (self.__build(segments[:half]),
+                    self.__build(segments[half:]))
+
+        return (box, children, ())
+
+    def query(self, box):
+        """ST.query(box) -> list of Segments
+
+        Finds the segments touching the box.
+        """
+
+        found = []
+
+        if self.__root is None:
+
+            return found
+
+        stack = [self.__root]
+
+        while stack:
+
+            node_box, children, segments = stack.pop()
+
+            if not intersect(node_box, box):
+
+                continue
+
+            stack.extend(children)
+
+            for segment in segments:
+
+                if intersect(segment.box(), box):
+
+                    found.append(segment)
+
+        return found
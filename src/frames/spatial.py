@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2012-2013 Karol Marcjan and Bartosz Boguniewicz
+#
+# This file is part of Quantee.
+#
+# Foobar is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Foobar is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import math
+
+from boxes import Box, intersect, ray_hit
+
+__all__ = ['SpatialHash']
+
+
+class SpatialHash(object):
+    """SpatialHash([cell_size]) -> an empty SpatialHash
+
+    Stores items under Boxes in a uniform grid of square cells, so that the
+    items whose boxes touch a given Box can be found without looking at all
+    the others. A query costs time proportional to the number of cells it
+    covers and items it finds, not to the number of items stored.
+    """
+
+    def __init__(self, cell_size=128):
+
+        self.__cell_size = float(cell_size)
+
+        self.__cells = {}
+        self.__items = {}
+
+    def __len__(self):
+        """SH.__len__() <=> len(SH)"""
+
+        return len(self.__items)
+
+    def __contains__(self, item):
+        """SH.__contains__(item) <=> item in SH"""
+
+        return item in self.__items
+
+    def __iter__(self):
+        """SH.__iter__() <=> iter(SH)"""
+
+        return iter(self.__items)
+
+    def __span(self, box):
+        """SH.__span(box) -> (left, bottom, right, top)
+
+        The range of cells covered by the box.
+        """
+
+        size = self.__cell_size
+
+        return (int(math.floor(box.x / size)),
+                int(math.floor(box.y / size)),
+                int(math.floor((box.x + box.w) / size)),
+                int(math.floor((box.y + box.h) / size)))
+
+    def __cells_in(self, span):
+
+        left, bottom, right, top = span
+
+        for i in range(left, right + 1):
+
+            for j in range(bottom, top + 1):
+
+                yield (i, j)
+
+    def box(self, item):
+        """SH.box(item) -> the Box the item is stored under"""
+
+        return self.__items[item][0]
+
+    def insert(self, item, box):
+        """SH.insert(item, box)
+
+        Store the item under a copy of the box, replacing its old box if it
+        was already stored.
+        """
+
+        if item in self.__items:
+
+            self.remove(item)
+
+        span = self.__span(box)
+
+        self.__items[item] = (Box(box.x, box.y, box.w, box.h), span)
+
+        for cell in self.__cells_in(span):
+
+            self.__cells.setdefault(cell, set()).add(item)
+
+    def update(self, item, box):
+        """SH.update(item, box)
+
+        Move an item under a new box. Cheap when it stays in the same cells.
+        """
+
+        old = self.__items.get(item)
+
+        if old is not None and old[1] == self.__span(box):
+
+            old[0].move_to(box.x, box.y)
+            old[0].w, old[0].h = box.w, box.h
+
+        else:
+
+            self.insert(item, box)
+
+    def remove(self, item):
+        """SH.remove(item)
+
+        Forget about the item. Raises KeyError when it isn't stored.
+        """
+
+        box, span = self.__items.pop(item)
+
+        for cell in self.__cells_in(span):
+
+            bucket = self.__cells[cell]
+            bucket.discard(item)
+
+            if not bucket:
+
+                del self.__cells[cell]
+
+    def discard(self, item):
+        """SH.discard(item)
+
+        Forget about the item, if it is stored.
+        """
+
+        if item in self.__items:
+
+            self.remove(item)
+
+    def clear(self):
+        """SH.clear()
+
+        Forget about all the items.
+        """
+
+        self.__cells = {}
+        self.__items = {}
+
+    def __traverse(self, origin, direction, max_t):
+        """SH.__traverse(origin, direction, max_t) -> iterator of (t, cell)
+
+        Walks the cells a ray passes through, in order, with the t at which it
+        enters each of them.
+        """
+
+        size = self.__cell_size
+
+        x, y = origin
+        dx, dy = direction
+
+        i = int(math.floor(x / size))
+        j = int(math.floor(y / size))
+
+        inf = float('inf')
+
+        if dx:
+
+            step_i = 1 if dx > 0 else -1
+            t_delta_x = size / abs(dx)
+            t_max_x = ((i + (dx > 0)) * size - x) / dx
+
+        else:
+
+            step_i, t_delta_x, t_max_x = 0, inf, inf
+
+        if dy:
+
+            step_j = 1 if dy > 0 else -1
+            t_delta_y = size / abs(dy)
+            t_max_y = ((j + (dy > 0)) * size - y) / dy
+
+        else:
+
+            step_j, t_delta_y, t_max_y = 0, inf, inf
+
+        t = 0.0
+
+        while t <= max_t:
+
+            yield t, (i, j)
+
+            if t_max_x < t_max_y:
+
+                t = t_max_x
+                t_max_x += t_delta_x
+                i += step_i
+
+            else:
+
+                t = t_max_y
+                t_max_y += t_delta_y
+                j += step_j
+
+    def trace(self, origin, direction, max_t, accept=None, first=False):
+        """SH.trace(origin, direction, max_t[, accept[, first]]) -> list of
+        (t, item)
+
+        Finds the items whose boxes the ray origin + t * direction hits for
+        0 <= t <= max_t, ordered by t. Only the cells along the ray are looked
+        at. Items for which accept(item) is false are skipped.
+
+        With first set, stops as soon as the nearest hit is known.
+        """
+
+        if not self.__items:
+
+            return []
+
+        if direction == (0, 0):
+
+            max_t = 0
+
+        hits, seen = [], set()
+
+        for t_cell, cell in self.__traverse(origin, direction, max_t):
+
+            if first and hits and min(hits)[0] < t_cell:
+
+                break
+
+            for item in self.__cells.get(cell, ()):
+
+                if item in seen:
+
+                    continue
+
+                seen.add(item)
+
+                t = ray_hit(origin, direction, self.__items[item][0])
+
+                if (t is not None and t <= max_t and
+                        (accept is None or accept(item))):
+
+                    hits.append((t, item))
+
+        hits.sort(key=lambda hit: hit[0])
+
+        return hits[:1] if first else hits
+
+    def query(self, box):
+        """SH.query(box) -> set of items
+
+        Find all the items whose boxes intersect the given one.
+        """
+
+        found, seen = set(), set()
+
+        for cell in self.__cells_in(self.__span(box)):
+
+            for item in self.__cells.get(cell, ()):
+
+                if item in seen:
+
+                    continue
+
+                seen.add(item)
+
+                if intersect(self.__items[item][0], box):
+
+                    found.add(item)
+
+        return found
@@ -18,8 +18,14 @@
 # along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
 
 
+import math
 import logging
 
+from tilemap import Tilemap
+from spatial import SpatialHash
+from contacts import Contacts
+from events import (LifecycleBus,
+                    SPAWNED, DIED, LAYER_CHANGED, STATE_CHANGED)
 
 __all__ = ['Stage']
 
@@ -35,6 +41,9 @@ class Stage(object):
     Stages store Entities in layers.
 
     Layers are all named. Layers and the Entities in them have a set order.
+
+    Tilemaps are spawned like any other Entity, but the Stage also keeps
+    track of them so that obstacles can be looked up in them.
     """
 
     def __init__(self, size, layers, default_layer):
@@ -55,10 +64,34 @@ class Stage(object):
             self.__layers[layer] = []
             self.__spawns[layer] = []
 
+        # Entities are kept in the order of layers and then spawning
+        self.__order = {}
+        self.__spawned = 0
+
         # To properly render everything we need to keep track of what dies
         self.__dirty = set()
         self.__death_observers = []
 
+        # ...and also of what gets born or changes
+        self.__spawn_observers = []
+        self.__change_observers = []
+
+        self.__tilemaps = []
+        self.__segments = None
+
+        # Physics queries go through an index of b_boxes
+        self.__index = SpatialHash()
+
+        self.__contacts = Contacts(self.__index)
+
+        self.__events = LifecycleBus()
+
+        # The Entities that acted since the last harvest, None meaning all
+        self.__acted = None
+
+        # Collision masks are optional
+        self.__mask_source = None
+
         logger.info('%dx%d Stage created', size[0], size[1])
         logger.info('%d layers created: %s', len(layers), layers)
 
@@ -79,7 +112,230 @@ class Stage(object):
 
         return self.__size
 
+    def tilemaps(self):
+        """S.tilemaps() -> list of the Tilemaps on the Stage"""
+
+        return self.__tilemaps
+
+    def segments(self):
+        """S.segments() -> a SegmentTree or None
+
+        The obstacle segments of the Stage, if it has them.
+        """
+
+        return self.__segments
+
+    def move_to_layer(self, entity, layer):
+        """S.move_to_layer(entity, layer)
+
+        Moves a spawned Entity to the top of another layer.
+        """
+
+        if layer not in self.__layer_names:
+            raise ValueError('Non-existent layer name')
+
+        i, _ = self.__order[entity]
+        old = self.__layer_names[i]
+
+        self.__layers[old].remove(entity)
+        self.__layers[layer].append(entity)
+
+        self.__order[entity] = (self.__layer_names.index(layer),
+                                self.__spawned)
+        self.__spawned += 1
+
+        # Drawing order changed, so it needs redrawing
+        for change_observer in self.__change_observers:
+
+            change_observer.tell_changed(entity)
+
+        self.__events.post(LAYER_CHANGED, entity, (old, layer))
+
+    def set_tile(self, tilemap, i, j, tile):
+        """S.set_tile(tilemap, i, j, tile)
+
+        Replaces a tile of a spawned Tilemap, see Tilemap.set_tile, and tells
+        the change observers, so that it gets redrawn.
+        """
+
+        tilemap.set_tile(i, j, tile)
+
+        # The tiles aren't part of the states compared by act
+        for change_observer in self.__change_observers:
+
+            change_observer.tell_changed(tilemap)
+
+    def subscribe(self, observer, kinds=None, entity=None, cls=None,
+                  tag=None):
+        """S.subscribe(observer[, kinds[, entity[, cls[, tag]]]])
+
+        Subscribes the observer to lifecycle events (SPAWNED, DIED,
+        LAYER_CHANGED, STATE_CHANGED) of Entities on the Stage. They are
+        delivered in one batch per step, by flush_events. See
+        LifecycleBus.subscribe.
+        """
+
+        self.__events.subscribe(observer, kinds, entity, cls, tag)
+
+    def flush_events(self):
+        """S.flush_events()
+
+        Delivers the lifecycle events since the last flush.
+        """
+
+        self.__events.flush(self)
+
+    def watch_contacts(self, kind_a, kind_b):
+        """S.watch_contacts(kind_a, kind_b)
+
+        From now on, after each step tell Entities of the two kinds (Entity
+        classes or tags) when contacts between them begin, persist and end.
+        """
+
+        self.__contacts.watch(kind_a, kind_b, list(self))
+
+    # Queries
+    def box_query(self, box):
+        """S.box_query(box) -> list of Entities
+
+        The Entities whose b_boxes touch the box, in Stage order.
+        """
+
+        return sorted(self.__index.query(box), key=self.order)
+
+    def segment_query(self, a, b):
+        """S.segment_query((x_a, y_a), (x_b, y_b)) -> list of Entities
+
+        The Entities whose b_boxes the segment from a to b crosses, nearest to
+        a first.
+        """
+
+        direction = (b[0] - a[0], b[1] - a[1])
+
+        return [entity
+                for t, entity in self.__index.trace(a, direction, 1)]
+
+    def raycast(self, origin, direction, max_dist=None, filter=None):
+        """S.raycast((x, y), (dx, dy)[, max_dist[, filter]]) -> (entity,
+        distance) or None
+
+        Finds the first Entity whose b_box is hit by a ray, within max_dist
+        (by default, the diagonal of the Stage). When filter is given, only
+        the Entities for which filter(entity) is true count.
+        """
+
+        length = math.hypot(*direction)
+
+        if length == 0:
+
+            return None
+
+        if max_dist is None:
+
+            max_dist = math.hypot(*self.__size)
+
+        unit = (direction[0] / length, direction[1] / length)
+
+        hits = self.__index.trace(origin, unit, max_dist, filter, first=True)
+
+        if not hits:
+
+            return None
+
+        distance, entity = hits[0]
+
+        return entity, distance
+
+    def set_segments(self, segments):
+        """S.set_segments(segments)
+
+        Sets the SegmentTree of static obstacle segments.
+        """
+
+        self.__segments = segments
+
+        logger.info('%d obstacle segments set', len(segments))
+
+    def order(self, entity):
+        """S.order(entity) -> a sort key
+
+        Entities sorted by their keys come in the same order as when iterating
+        over the Stage.
+        """
+
+        return self.__order[entity]
+
+    def set_mask_source(self, source):
+        """S.set_mask_source(source)
+
+        Sets the object whose load_mask(sprite_name, region) method provides
+        the collision masks of sprites. Usually an Engine.
+        """
+
+        self.__mask_source = source
+
+    def mask(self, sprite_name, region=None):
+        """S.mask(sprite_name[, region]) -> a mask or None
+
+        The collision mask of a sprite, or of the (x, y, w, h) region of it,
+        or None if there is no source of masks or it doesn't know the sprite.
+        """
+
+        if self.__mask_source is None:
+
+            return None
+
+        return self.__mask_source.load_mask(sprite_name, region)
+
     # Logic
+    def act(self, entities=None):
+        """S.act([entities])
+
+        Makes the Entities (all of them by default) execute the actions they
+        decided upon and tells the change observers about the ones that moved
+        or changed state.
+        """
+
+        if entities is None:
+
+            entities = self
+
+            self.__acted = None
+
+        elif self.__acted is not None:
+
+            self.__acted.extend(entities)
+
+        for entity in entities:
+
+            entity.act()
+
+            now, then = entity.present(), entity.past()
+
+            b_moved = now.b_box() != then.b_box()
+
+            if b_moved:
+
+                self.__index.update(entity, now.b_box())
+
+            state_changed = now.state_name() != then.state_name()
+
+            if state_changed:
+
+                self.__events.post(STATE_CHANGED, entity,
+                                   (then.state_name(), now.state_name()))
+
+            if (b_moved or state_changed or
+                    now.r_box() != then.r_box() or
+                    now.clip() != then.clip() or
+                    now.frame() != then.frame()):
+
+                for change_observer in self.__change_observers:
+
+                    change_observer.tell_changed(entity)
+
+        self.__contacts.update(self)
+
     def harvest_dead(self):
         """S.harvest_dead()
 
@@ -88,16 +344,24 @@ class Stage(object):
 
         dead = {}
 
+        # Only those who acted since the last harvest could have died
+        suspects = self if self.__acted is None else self.__acted
+
+        self.__acted = []
+
         # Find the indices of dead Entities in each layer
-        for name in self.__layers:
+        for entity in set(suspects):
 
-            dead[name] = []
+            if entity.present().dead():
 
-            for i, entity in enumerate(self.__layers[name]):
+                name = self.__layer_names[self.__order[entity][0]]
 
-                if entity.present().dead():
+                dead.setdefault(name, []).append(
+                    self.__layers[name].index(entity))
 
-                    dead[name].insert(0, i)
+        for name in dead:
+
+            dead[name].sort(reverse=True)
 
         # Remove the dead Entities from each layer
         #
@@ -109,6 +373,18 @@ class Stage(object):
 
                 corpse = self.__layers[name].pop(i)
 
+                del self.__order[corpse]
+
+                self.__index.discard(corpse)
+
+                self.__contacts.tell_is_dead(corpse, self)
+
+                self.__events.post(DIED, corpse)
+
+                if isinstance(corpse, Tilemap):
+
+                    self.__tilemaps.remove(corpse)
+
                 self.__dirty.add(corpse)
 
                 # Notify everyone who might be interested
@@ -143,18 +419,39 @@ class Stage(object):
         Spawns all the Entities scheudled for spawning.
         """
 
-        for name in self.__layer_names:
+        for i, name in enumerate(self.__layer_names):
+
+            spawns = self.__spawns[name]
 
-            for spawn in self.__spawns[name]:
+            for spawn in spawns:
 
                 logger.debug('Spawning %s in %s',
                              spawn,
                              name)
 
-            self.__layers[name].extend(self.__spawns[name])
+                self.__order[spawn] = (i, self.__spawned)
+                self.__spawned += 1
+
+                self.__index.insert(spawn, spawn.present().b_box())
+
+                self.__contacts.tell_spawned(spawn)
+
+                self.__events.post(SPAWNED, spawn, name)
+
+                if isinstance(spawn, Tilemap):
+
+                    self.__tilemaps.append(spawn)
+
+            self.__layers[name].extend(spawns)
 
             self.__spawns[name] = []
 
+            for spawn in spawns:
+
+                for spawn_observer in self.__spawn_observers:
+
+                    spawn_observer.tell_spawned(spawn)
+
     def add_death_observer(self, observer):
         """S.add_death_observer(observer)
 
@@ -165,3 +462,25 @@ class Stage(object):
         logger.info('%s now observes the deaths in %s',
                     observer,
                     self)
+
+    def add_spawn_observer(self, observer):
+        """S.add_spawn_observer(observer)
+
+        Adds a new observer of spawning entities."""
+
+        self.__spawn_observers.append(observer)
+
+        logger.info('%s now observes the spawns in %s',
+                    observer,
+                    self)
+
+    def add_change_observer(self, observer):
+        """S.add_change_observer(observer)
+
+        Adds a new observer of entities moving or changing state."""
+
+        self.__change_observers.append(observer)
+
+        logger.info('%s now observes the changes in %s',
+                    observer,
+                    self)
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2012-2013 Karol Marcjan and Bartosz Boguniewicz
+#
+# This file is part of Quantee.
+#
+# Foobar is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Foobar is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import logging
+
+from collections import deque
+from timeit import default_timer
+
+__all__ = ['Tasks', 'URGENT', 'NORMAL', 'BACKGROUND']
+
+
+logger = logging.getLogger(__name__)
+
+logger.addHandler(logging.NullHandler())
+
+
+URGENT = 0
+NORMAL = 1
+BACKGROUND = 2
+
+
+class Tasks(object):
+    """Tasks([max_wait]) -> an empty Tasks
+
+    Cooperative scheduler for work that can wait, run in the time left at the
+    end of frames.
+
+    A task is a generator doing a short slice of its work between yields, it
+    is finished once it stops. Tasks of higher priority (URGENT, NORMAL and
+    BACKGROUND, in this order) are resumed first, those of the same one take
+    turns.
+
+    At least one slice is run each frame, even with no time left. A task that
+    waited max_wait frames goes before anyone else, so background work never
+    starves.
+    """
+
+    def __init__(self, max_wait=30):
+
+        self.__max_wait = max_wait
+
+        self.__queues = dict((priority, deque())
+                             for priority in (URGENT, NORMAL, BACKGROUND))
+
+        # The frame each task was last resumed on (or added)
+        self.__frame = 0
+        self.__resumed = {}
+
+    def __len__(self):
+        """T.__len__() <=> len(T)"""
+
+        return len(self.__resumed)
+
+    def add(self, task, priority=NORMAL):
+        """T.add(task[, priority]) -> the task
+
+        Schedules a generator to be resumed in idle time.
+        """
+
+        self.__queues[priority].append(task)
+        self.__resumed[task] = self.__frame
+
+        return task
+
+    def cancel(self, task):
+        """T.cancel(task)
+
+        Stops resuming the task. Does nothing to tasks that already ended.
+        """
+
+        # Tasks that finished or failed are in no queue any more
+        if self.__resumed.pop(task, None) is not None:
+
+            for queue in self.__queues.values():
+
+                if task in queue:
+
+                    queue.remove(task)
+
+                    break
+
+        task.close()
+
+    def __next(self):
+        # The task to resume next and its queue
+
+        starving = None
+
+        for priority in sorted(self.__queues):
+
+            queue = self.__queues[priority]
+
+            if queue and (starving is None or
+                          self.__resumed[queue[0]] <
+                          self.__resumed[starving[0]]):
+
+                starving = queue
+
+        if (starving is not None and
+                self.__frame - self.__resumed[starving[0]] >= self.__max_wait):
+
+            return starving
+
+        for priority in sorted(self.__queues):
+
+            if self.__queues[priority]:
+
+                return self.__queues[priority]
+
+        return None
+
+    def __resume(self, queue):
+
+        task = queue.popleft()
+
+        try:
+
+            next(task)
+
+        except StopIteration:
+
+            del self.__resumed[task]
+
+            return
+
+        except Exception:
+
+            logger.exception('Task %s failed', task)
+
+            del self.__resumed[task]
+
+            return
+
+        self.__resumed[task] = self.__frame
+
+        queue.append(task)
+
+    def run(self, time_left):
+        """T.run(time_left)
+
+        Resumes tasks for time_left milliseconds (None meaning just one). To
+        be called once a frame.
+        """
+
+        self.__frame += 1
+
+        deadline = default_timer() + (time_left or 0) / 1000.0
+
+        queue = self.__next()
+
+        while queue is not None:
+
+            self.__resume(queue)
+
+            if default_timer() >= deadline:
+
+                break
+
+            queue = self.__next()
+
+    def finish(self):
+        """T.finish()
+
+        Runs all the tasks to the end, in order of priority.
+        """
+
+        logger.info('Finishing %d tasks', len(self))
+
+        for priority in sorted(self.__queues):
+
+            queue = self.__queues[priority]
+
+            while queue:
+
+                self.__resume(queue)
@@ -0,0 +1,343 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2012-2013 Karol Marcjan and Bartosz Boguniewicz
+#
+# This file is part of Quantee.
+#
+# Foobar is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Foobar is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import logging
+import threading
+
+from collections import namedtuple
+
+from boxes import Box
+from engine import Engine
+from drawing_strategy import DrawingStrategy, RenderIndex
+from game import Game
+
+__all__ = ['ThreadedGame', 'Snapshot', 'Sprite']
+
+
+logger = logging.getLogger(__name__)
+
+logger.addHandler(logging.NullHandler())
+
+
+Sprite = namedtuple('Sprite', 'x y sprite_name region layer')
+
+
+class Snapshot(namedtuple('Snapshot', 'frame viewport sprites')):
+    """Snapshot(frame, viewport, sprites) -> a Snapshot
+
+    Everything needed to draw a frame, without touching any Entity: the frame
+    number, the (x, y, w, h) of the viewport and the Sprites to draw, in
+    order.
+    """
+
+    __slots__ = ()
+
+
+class Recorder(object):
+    """Recorder() -> a Recorder
+
+    Stands in for an Engine while Entities draw themselves, writing down
+    what they would draw.
+    """
+
+    def __init__(self):
+
+        self.sprites = []
+        self.layer = None
+
+    def draw(self, pos, sprite_name, viewport, region=None):
+
+        x, y = pos
+
+        self.sprites.append(Sprite(
+            x, y,
+            sprite_name,
+            None if region is None else tuple(region),
+            self.layer))
+
+
+class Snapshots(DrawingStrategy):
+    """Snapshots(renderer) -> a DrawingStrategy
+
+    Instead of drawing, hands Snapshots of whatever is visible over to the
+    Renderer.
+    """
+
+    def __init__(self, renderer):
+
+        self.__renderer = renderer
+
+        self.__index = None
+        self.__frame = 0
+
+    def force_all(self):
+
+        # Snapshots are always drawn whole
+        pass
+
+    def render(self, stage, engine, viewport, alpha=1):
+
+        if self.__index is None or self.__index.stage() is not stage:
+
+            self.__index = RenderIndex(stage)
+
+        index = self.__index
+
+        index.refresh()
+
+        recorder = Recorder()
+
+        for entity in index.in_view(viewport, alpha):
+
+            recorder.layer = stage.order(entity)[0]
+
+            entity.draw(recorder, viewport, alpha)
+
+        self.__frame += 1
+
+        self.__renderer.publish(Snapshot(
+            self.__frame,
+            (viewport.x, viewport.y, viewport.w, viewport.h),
+            tuple(recorder.sprites)))
+
+
+class Renderer(threading.Thread):
+    """Renderer(engine, lock) -> a Renderer
+
+    Thread drawing the latest Snapshot with the engine and updating the
+    display. Snapshots published before the previous one got drawn are
+    skipped.
+
+    Engine calls are made holding the lock, one at a time.
+    """
+
+    def __init__(self, engine, lock):
+
+        super(Renderer, self).__init__(name='Renderer')
+
+        self.daemon = True
+
+        self.__engine = engine
+        self.__lock = lock
+
+        self.__condition = threading.Condition()
+        self.__latest = None
+        self.__stopping = False
+        self.__error = None
+
+        self.__published = 0
+        self.__drawn = 0
+
+    def publish(self, snapshot):
+        """R.publish(snapshot)
+
+        Makes the snapshot the one to draw next. Raises whatever made the
+        Renderer fail, if it did.
+        """
+
+        if self.__error is not None:
+
+            raise self.__error
+
+        with self.__condition:
+
+            self.__latest = snapshot
+            self.__published += 1
+
+            self.__condition.notify()
+
+    def stop(self):
+        """R.stop()
+
+        Makes the Renderer finish and waits for it.
+        """
+
+        with self.__condition:
+
+            self.__stopping = True
+
+            self.__condition.notify()
+
+        self.join()
+
+    def stats(self):
+        """R.stats() -> dict of how many Snapshots were published and drawn"""
+
+        return dict(published=self.__published, drawn=self.__drawn)
+
+    def run(self):
+
+        try:
+
+            while True:
+
+                with self.__condition:
+
+                    while self.__latest is None and not self.__stopping:
+
+                        self.__condition.wait()
+
+                    if self.__stopping:
+
+                        return
+
+                    snapshot, self.__latest = self.__latest, None
+
+                self.__draw(snapshot)
+
+        except Exception as error:
+
+            logger.exception('The Renderer failed')
+
+            self.__error = error
+
+    def __draw(self, snapshot):
+
+        engine, lock = self.__engine, self.__lock
+
+        viewport = Box(*snapshot.viewport)
+
+        for sprite in snapshot.sprites:
+
+            with lock:
+
+                engine.draw((sprite.x, sprite.y),
+                            sprite.sprite_name,
+                            viewport,
+                            sprite.region)
+
+        with lock:
+
+            engine.update()
+
+        self.__drawn += 1
+
+
+class SharedEngine(Engine):
+    """SharedEngine(engine, lock) -> an Engine
+
+    The physics thread's view of an Engine the Renderer draws with. Calls
+    that reach the assets hold the lock, drawing is left to the Renderer.
+    """
+
+    def __init__(self, engine, lock):
+
+        super(SharedEngine, self).__init__()
+
+        self.__engine = engine
+        self.__lock = lock
+
+    def dt(self):
+
+        return self.__engine.dt()
+
+    def time_left(self):
+
+        return self.__engine.time_left()
+
+    def input(self):
+
+        return self.__engine.input()
+
+    def options(self):
+
+        return self.__engine.options()
+
+    def preload(self, sprite_names):
+
+        with self.__lock:
+
+            self.__engine.preload(sprite_names)
+
+    def load_mask(self, sprite_name, region=None):
+
+        with self.__lock:
+
+            return self.__engine.load_mask(sprite_name, region)
+
+    def changed_sprites(self):
+
+        with self.__lock:
+
+            return self.__engine.changed_sprites()
+
+    def close(self):
+
+        with self.__lock:
+
+            self.__engine.close()
+
+    def update(self):
+
+        # The Renderer does that
+        pass
+
+
+class ThreadedGame(Game):
+    """ThreadedGame(engine, init_level[, ...]) -> a ThreadedGame
+
+    A Game drawing on a thread of its own. Each frame, the thread running the
+    Game publishes a Snapshot of what is visible: the position, sprite and
+    layer of everything to draw. A Renderer thread draws the latest one and
+    updates the display, while physics go on. A slow frame then no longer
+    holds the simulation up, and the two overlap on machines with more cores.
+
+    Every Snapshot is drawn whole, like with Everyone. The remaining
+    arguments are those of Game, save for the drawing strategy.
+
+    Input still has to be read on the main thread, so run the Game there.
+    Changing display options is not supported.
+
+    This is experimental: the display gets updated off the main thread while
+    events are pumped on it, which SDL does not promise to allow on every
+    platform. It has only been tried with SDL_VIDEODRIVER=dummy so far.
+    """
+
+    def __init__(self, engine, init_level, **kwargs):
+
+        logger.warning('ThreadedGame is experimental, it updates the display '
+                       'off the main thread')
+
+        lock = threading.Lock()
+
+        self.__renderer = Renderer(engine, lock)
+
+        super(ThreadedGame, self).__init__(SharedEngine(engine, lock),
+                                           Snapshots(self.__renderer),
+                                           init_level,
+                                           **kwargs)
+
+    def renderer(self):
+
+        return self.__renderer
+
+    def start(self):
+
+        super(ThreadedGame, self).start()
+
+        self.__renderer.start()
+
+    def stop(self):
+
+        self.__renderer.stop()
+
+        logger.info('Renderer statistics: %s', self.__renderer.stats())
+
+        super(ThreadedGame, self).stop()
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2012-2013 Karol Marcjan and Bartosz Boguniewicz
+#
+# This file is part of Quantee.
+#
+# Foobar is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Foobar is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import math
+import logging
+
+from array import array
+
+from boxes import Box, intersect
+from entity import Entity
+from behaviour import Behaviour
+
+__all__ = ['Tilemap']
+
+
+logger = logging.getLogger(__name__)
+
+logger.addHandler(logging.NullHandler())
+
+
+class Still(Behaviour):
+    """Still() -> a Behaviour that does nothing"""
+
+    def prepare(self, prev, curr, next):
+        pass
+
+    def decide(self, dt, event, stage, hint, prev, curr, next):
+        pass
+
+
+class Tilemap(Entity):
+    """Tilemap(x, y, tile_size, rows, tileset[, solid]) -> a Tilemap
+
+    A grid of tiles with its bottom left corner at (x, y), stored as a
+    compact array of tile IDs instead of an Entity per tile.
+
+      * `tile_size` is the (width, height) of a single tile
+
+      * `rows` is a list of rows of tile IDs, top row first, as one would
+        draw it. 0 means no tile.
+
+      * `tileset` maps tile IDs to sprite names, either as a dictionary or a
+        list indexed by ID
+
+      * `solid` lists the IDs of tiles that are obstacles. Defaults to all of
+        them.
+
+    Once spawned in a Stage it is drawn like any other Entity, and can be
+    asked for its solid tiles around a box by grid lookup.
+    """
+
+    def __init__(self, x, y, tile_size, rows, tileset, solid=None):
+
+        t_w, t_h = tile_size
+
+        self.__columns = max(len(row) for row in rows) if rows else 0
+        self.__rows = len(rows)
+
+        size = (t_w * self.__columns, t_h * self.__rows)
+
+        super(Tilemap, self).__init__((x, y), size, size, 'tilemap', Still())
+
+        self.__origin = (x, y)
+        self.__tile_size = tile_size
+
+        if isinstance(tileset, dict):
+
+            self.__tileset = tileset
+
+        else:
+
+            self.__tileset = dict(enumerate(tileset))
+
+        if solid is None:
+
+            solid = [tile for tile in self.__tileset if tile]
+
+        self.__solid = frozenset(solid)
+
+        # Stored bottom row first, so that rows grow along the y axis
+        self.__tiles = array('H', [0] * (self.__columns * self.__rows))
+
+        for j, row in enumerate(reversed(rows)):
+
+            for i, tile in enumerate(row):
+
+                self.__tiles[j * self.__columns + i] = tile
+
+        logger.info('%dx%d Tilemap created', self.__columns, self.__rows)
+
+    def tile(self, i, j):
+        """T.tile(i, j) -> tile ID
+
+        The tile in the i-th column and j-th row, counting from the bottom
+        left. Outside the map there are no tiles.
+        """
+
+        if 0 <= i < self.__columns and 0 <= j < self.__rows:
+
+            return self.__tiles[j * self.__columns + i]
+
+        return 0
+
+    def set_tile(self, i, j, tile):
+        """T.set_tile(i, j, tile)
+
+        Replaces a tile. Once spawned, replace them through Stage.set_tile
+        instead, which has the change redrawn.
+        """
+
+        self.__tiles[j * self.__columns + i] = tile
+
+    def cell_at(self, x, y):
+        """T.cell_at(x, y) -> (i, j)
+
+        The cell containing the point.
+        """
+
+        x_0, y_0 = self.__origin
+        t_w, t_h = self.__tile_size
+
+        return (int(math.floor((x - x_0) / float(t_w))),
+                int(math.floor((y - y_0) / float(t_h))))
+
+    def tile_box(self, i, j):
+        """T.tile_box(i, j) -> a Box covering the cell"""
+
+        x_0, y_0 = self.__origin
+        t_w, t_h = self.__tile_size
+
+        return Box(x_0 + i * t_w, y_0 + j * t_h, t_w, t_h)
+
+    def __cells(self, box):
+
+        left, bottom = self.cell_at(box.x, box.y)
+        right, top = self.cell_at(box.x + box.w, box.y + box.h)
+
+        left, bottom = max(left, 0), max(bottom, 0)
+        right = min(right, self.__columns - 1)
+        top = min(top, self.__rows - 1)
+
+        for j in range(bottom, top + 1):
+
+            for i in range(left, right + 1):
+
+                yield i, j, self.__tiles[j * self.__columns + i]
+
+    def solid_boxes(self, box):
+        """T.solid_boxes(box) -> list of Boxes
+
+        The solid tiles touching the box, found by looking only at the cells
+        it covers.
+        """
+
+        return [self.tile_box(i, j)
+                for i, j, tile in self.__cells(box)
+                if tile in self.__solid]
+
+    def draw(self, engine, viewport, alpha=1):
+        """T.draw(engine, viewport[, alpha])
+
+        Draws only the tiles in the viewport.
+        """
+
+        for i, j, tile in self.__cells(viewport):
+
+            if tile:
+
+                box = self.tile_box(i, j)
+
+                if intersect(box, viewport):
+
+                    engine.draw((box.x, box.y), self.__tileset[tile], viewport)
+
+    def sprite_names(self):
+        """T.sprite_names() -> set of the sprite names of the tiles"""
+
+        return set(name for tile, name in self.__tileset.items() if tile)
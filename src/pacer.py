@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2012-2013 Karol Marcjan and Bartosz Boguniewicz
+#
+# This file is part of Quantee.
+#
+# Foobar is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Foobar is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import time
+import argparse
+import logging
+
+try:
+    from time import perf_counter
+except ImportError:
+    # Python 2 has no perf_counter, time is the precise one on Unices
+    from time import time as perf_counter
+
+try:
+    from time import process_time
+except ImportError:
+    from time import clock as process_time
+
+__all__ = ['FramePacer']
+
+
+logger = logging.getLogger(__name__)
+
+logger.addHandler(logging.NullHandler())
+
+
+class FramePacer(object):
+    """FramePacer(max_fps[, spin_margin[, clock[, sleep]]]) -> a FramePacer
+
+    Keeps frames from coming more often than max_fps a second, like
+    Clock.tick, only precisely and without burning a core like
+    Clock.tick_busy_loop.
+
+    It sleeps for most of what is left of the frame and busy waits only for
+    the rest. How much longer than asked sleeps take is learned as it goes,
+    and that much (plus spin_margin seconds) is left out of each sleep.
+
+    The clock and sleep functions can be swapped for testing.
+    """
+
+    def __init__(self, max_fps, spin_margin=0.0005, clock=perf_counter,
+                 sleep=time.sleep):
+
+        self.__period = 1.0 / max_fps if max_fps else 0.0
+        self.__spin_margin = spin_margin
+
+        self.__clock = clock
+        self.__sleep = sleep
+
+        # A guess until the first sleeps are measured
+        self.__overshoot = 0.001
+
+        self.__last = None
+
+    def overshoot(self):
+        """FP.overshoot() -> the estimated sleep overshoot in seconds"""
+
+        return self.__overshoot
+
+    def time_left(self):
+        """FP.time_left() -> seconds until the current frame is due to end
+
+        It is 0 when the frame is late, or before the first tick.
+        """
+
+        if self.__last is None:
+
+            return 0.0
+
+        return max(0.0, self.__last + self.__period - self.__clock())
+
+    def __learn(self, error):
+
+        # Grow fast, shrink slowly, it is better to spin a bit too long than
+        # to miss a deadline
+        if error > self.__overshoot:
+
+            self.__overshoot += (error - self.__overshoot) * 0.5
+
+        else:
+
+            self.__overshoot += (error - self.__overshoot) * 0.05
+
+        self.__overshoot = max(0.0, self.__overshoot)
+
+    def tick(self):
+        """FP.tick() -> milliseconds since the previous tick
+
+        Waits until the current frame is due to end. To be called once per
+        frame.
+        """
+
+        clock = self.__clock
+
+        now = clock()
+
+        if self.__last is None:
+
+            self.__last = now
+
+            return 0.0
+
+        deadline = self.__last + self.__period
+
+        asleep = deadline - now - self.__overshoot - self.__spin_margin
+
+        if asleep > 0:
+
+            self.__sleep(asleep)
+
+            woken = clock()
+
+            self.__learn(woken - now - asleep)
+
+        while clock() < deadline:
+
+            pass
+
+        now = clock()
+
+        dt, self.__last = now - self.__last, now
+
+        return dt * 1000
+
+
+def __sleeping(max_fps):
+    # What Clock.tick does
+
+    period, last = [1.0 / max_fps], [perf_counter()]
+
+    def tick():
+
+        now = perf_counter()
+
+        left = last[0] + period[0] - now
+
+        if left > 0:
+
+            time.sleep(left)
+
+        now = perf_counter()
+
+        dt, last[0] = now - last[0], now
+
+        return dt * 1000
+
+    return tick
+
+
+def __spinning(max_fps):
+    # What Clock.tick_busy_loop does
+
+    period, last = [1.0 / max_fps], [perf_counter()]
+
+    def tick():
+
+        while perf_counter() < last[0] + period[0]:
+
+            pass
+
+        now = perf_counter()
+
+        dt, last[0] = now - last[0], now
+
+        return dt * 1000
+
+    return tick
+
+
+def benchmark(max_fps, frames, work=0.0):
+    """benchmark(max_fps, frames[, work]) -> dict of results
+
+    Paces frames, each doing work seconds of busy work, with plain sleeping,
+    busy waiting and a FramePacer. For each it measures the mean frame time,
+    the frame time jitter (standard deviation) and the worst miss, all in
+    milliseconds, and the share of a core used.
+    """
+
+    results = {}
+
+    modes = [('sleep', __sleeping(max_fps)),
+             ('busy', __spinning(max_fps)),
+             ('pacer', FramePacer(max_fps).tick)]
+
+    for name, tick in modes:
+
+        tick()
+
+        times = []
+
+        wall, cpu = perf_counter(), process_time()
+
+        for _ in range(frames):
+
+            end = perf_counter() + work
+
+            while perf_counter() < end:
+
+                pass
+
+            times.append(tick())
+
+        wall, cpu = perf_counter() - wall, process_time() - cpu
+
+        mean = sum(times) / len(times)
+        jitter = (sum((t - mean) ** 2 for t in times) / len(times)) ** 0.5
+
+        results[name] = dict(mean=mean,
+                             jitter=jitter,
+                             worst=max(times) - 1000.0 / max_fps,
+                             cpu=cpu / wall)
+
+    return results
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(
+        description='Compares frame pacing methods')
+
+    parser.add_argument(
+        '-f', '--fps',
+        dest='fps',
+        type=int,
+        default=60)
+
+    parser.add_argument(
+        '-n', '--frames',
+        dest='frames',
+        type=int,
+        default=300)
+
+    parser.add_argument(
+        '-w', '--work',
+        dest='work',
+        type=float,
+        default=4.0,
+        help='milliseconds of busy work per frame')
+
+    args = parser.parse_args()
+
+    results = benchmark(args.fps, args.frames, args.work / 1000.0)
+
+    print('%-6s %10s %10s %10s %6s' % ('mode', 'mean ms', 'jitter ms',
+                                       'worst ms', 'cpu'))
+
+    for name in ('sleep', 'busy', 'pacer'):
+
+        r = results[name]
+
+        print('%-6s %10.3f %10.3f %10.3f %5.0f%%' % (name, r['mean'],
+                                                     r['jitter'], r['worst'],
+                                                     r['cpu'] * 100))
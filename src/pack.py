@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2012-2013 Karol Marcjan and Bartosz Boguniewicz
+#
+# This file is part of Quantee.
+#
+# Foobar is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Foobar is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import time
+import mmap
+import struct
+import argparse
+import logging
+
+__all__ = ['AssetPack', 'write_pack']
+
+
+logger = logging.getLogger(__name__)
+
+logger.addHandler(logging.NullHandler())
+
+
+PACK_NAME = 'sprites.qpk'
+
+MAGIC = 'QPK1'
+
+# magic, bytes per pixel, red, green, blue and alpha masks, sprite count
+HEADER = struct.Struct('<4sIIIIII')
+
+# name, width, height, data offset, data length, color key (r, g, b), has key
+ENTRY = struct.Struct('<64sIIQQBBBB')
+
+ALIGN = 64
+
+
+# Layouts pygame.image.frombuffer makes opaque Surfaces of. None of them has
+# the masks of the common 32-bit XRGB display (BGRX in memory), so there the
+# pack gets copied after all.
+FORMATS = ('RGBX', 'RGB', 'BGR')
+
+
+def buffer_format(bytesize, masks):
+    """buffer_format(bytesize, masks) -> a pygame.image.frombuffer format or
+    None
+
+    Finds a format in which pygame.image.frombuffer wraps pixels of the given
+    size and masks as they are, by asking pygame rather than guessing, since
+    which formats it knows depends on its version.
+    """
+
+    import pygame
+
+    for fmt in FORMATS:
+
+        if len(fmt) != bytesize:
+
+            continue
+
+        try:
+
+            probe = pygame.image.frombuffer('\0' * bytesize, (1, 1), fmt)
+
+        except ValueError:
+
+            continue
+
+        if (probe.get_masks() == tuple(masks) and
+                not probe.get_flags() & pygame.SRCALPHA):
+
+            return fmt
+
+    return None
+
+
+def write_pack(asset_dir, color_key=(255, 0, 255), path=None):
+    """write_pack(asset_dir[, color_key[, path]]) -> the path written
+
+    Converts every sprite in the `sprites` directory of asset_dir to the
+    display's pixel format and writes them all into a single pack file,
+    `sprites.qpk` in asset_dir by default.
+
+    Needs to open a (tiny) window to learn the display's pixel format, so it
+    should be run on the machine the game will be played on.
+    """
+
+    import pygame
+
+    sprite_dir = os.path.join(asset_dir, 'sprites')
+
+    if path is None:
+
+        path = os.path.join(asset_dir, PACK_NAME)
+
+    pygame.init()
+    display = pygame.display.set_mode((1, 1))
+
+    bytesize = display.get_bytesize()
+    masks = display.get_masks()
+
+    names = sorted(os.path.splitext(file_name)[0]
+                   for file_name in os.listdir(sprite_dir)
+                   if file_name.endswith('.png'))
+
+    blobs = []
+
+    for name in names:
+
+        sprite = pygame.image.load(os.path.join(sprite_dir, name + '.png'))
+        sprite.set_colorkey(color_key)
+        sprite = sprite.convert()
+
+        w, h = sprite.get_size()
+        pitch = sprite.get_pitch()
+        raw = sprite.get_buffer().raw
+
+        # Drop the row padding, so that rows are contiguous
+        row = w * bytesize
+
+        blobs.append((name, w, h, ''.join(raw[y * pitch:y * pitch + row]
+                                          for y in range(h))))
+
+    offset = HEADER.size + ENTRY.size * len(blobs)
+
+    entries = []
+
+    for name, w, h, data in blobs:
+
+        offset += -offset % ALIGN
+
+        entries.append(ENTRY.pack(name, w, h, offset, len(data),
+                                  color_key[0], color_key[1], color_key[2],
+                                  1))
+
+        offset += len(data)
+
+    with open(path, 'wb') as pack_file:
+
+        pack_file.write(HEADER.pack(MAGIC, bytesize,
+                                    masks[0], masks[1], masks[2], masks[3],
+                                    len(blobs)))
+
+        for entry in entries:
+
+            pack_file.write(entry)
+
+        for name, w, h, data in blobs:
+
+            pack_file.write('\0' * (-pack_file.tell() % ALIGN))
+            pack_file.write(data)
+
+    logger.info('%d sprites packed into %s', len(blobs), path)
+
+    return path
+
+
+class AssetPack(object):
+    """AssetPack(path) -> an opened AssetPack
+
+    A pack file written by write_pack, mapped into memory. Sprites never get
+    decoded, but whether they get copied depends on the pixel format. When the
+    display still uses the format the pack was written in and
+    pygame.image.frombuffer can wrap it (see buffer_format), sprites are made
+    straight from the mapped pixels. Otherwise, and that includes the usual
+    32-bit XRGB display, each sprite gets copied row by row into a Surface of
+    the pack's format. The copy is a plain memcpy per row, far cheaper than
+    decoding a PNG, and its total time is logged when the pack is closed.
+    """
+
+    def __init__(self, path):
+
+        self.__file = open(path, 'rb')
+        self.__map = mmap.mmap(self.__file.fileno(), 0,
+                               access=mmap.ACCESS_COPY)
+
+        (magic, self.__bytesize,
+         r, g, b, a, count) = HEADER.unpack_from(self.__map, 0)
+
+        if magic != MAGIC:
+
+            raise ValueError('%s is not a sprite pack' % path)
+
+        self.__masks = (r, g, b, a)
+
+        self.__format = None
+        self.__format_known = False
+
+        self.__copied = 0
+        self.__copy_time = 0.0
+
+        self.__index = {}
+
+        for i in range(count):
+
+            entry = ENTRY.unpack_from(self.__map,
+                                      HEADER.size + i * ENTRY.size)
+
+            name = entry[0].rstrip('\0')
+
+            self.__index[name] = entry[1:]
+
+        logger.info('Sprite pack %s with %d sprites opened', path, count)
+
+    def __contains__(self, name):
+        """AP.__contains__(name) <=> name in AP"""
+
+        return name in self.__index
+
+    def names(self):
+        """AP.names() -> list of sprite names"""
+
+        return list(self.__index)
+
+    def sprite(self, name):
+        """AP.sprite(name) -> a Surface
+
+        Makes a sprite out of the mapped pixels, with the color key already
+        set.
+        """
+
+        import pygame
+
+        w, h, offset, length, r, g, b, has_key = self.__index[name]
+
+        pixels = buffer(self.__map, offset, length)
+
+        fmt = self.__buffer_format()
+
+        if fmt is not None:
+
+            sprite = pygame.image.frombuffer(pixels, (w, h), fmt)
+
+        else:
+
+            start = time.time()
+
+            sprite = pygame.Surface((w, h), 0, 8 * self.__bytesize,
+                                    self.__masks)
+
+            target = sprite.get_buffer()
+            pitch = sprite.get_pitch()
+            row = w * self.__bytesize
+
+            for y in range(h):
+
+                target.write(pixels[y * row:(y + 1) * row], y * pitch)
+
+            self.__copied += 1
+            self.__copy_time += time.time() - start
+
+        if has_key:
+
+            sprite.set_colorkey((r, g, b))
+
+        return sprite
+
+    def copied(self):
+        """AP.copied() -> (sprites copied, seconds spent copying them)"""
+
+        return self.__copied, self.__copy_time
+
+    def __buffer_format(self):
+
+        if not self.__format_known:
+
+            import pygame
+
+            display = pygame.display.get_surface()
+
+            if (display is not None and
+                    display.get_bytesize() == self.__bytesize and
+                    display.get_masks() == self.__masks):
+
+                self.__format = buffer_format(self.__bytesize, self.__masks)
+
+            if self.__format is None:
+
+                logger.info('pygame cannot wrap the pack\'s pixels, sprites '
+                            'will be copied out of it')
+
+            self.__format_known = True
+
+        return self.__format
+
+    def close(self):
+        """AP.close()
+
+        Unmaps the pack. Sprites wrapped around it must not be used afterwards.
+        """
+
+        if self.__copied:
+
+            logger.info('%d sprites copied out of the pack in %.1f ms',
+                        self.__copied, 1000 * self.__copy_time)
+
+        self.__map.close()
+        self.__file.close()
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(
+        description='Packs the sprites into a memory-mappable file')
+
+    parser.add_argument(
+        'asset_dir',
+        nargs='?',
+        default=os.path.join(
+            os.path.dirname(os.path.abspath(__file__)),
+            '..',
+            'assets'))
+
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    write_pack(args.asset_dir)
@@ -20,18 +20,28 @@
 import os.path
 import math
 import argparse
+import functools
 import logging.config
 
 from yaml import load
 
 from frames.game import Game
+from frames.collector import Collector
+from frames.governor import (Governor, Interpolation, Timestep,
+                             OffscreenUpdates)
 from frames.level import Level
+from frames.level_file import load_level_data, build_stage
 from frames.drawing_strategy import DirtyWholes
-from frames.stage import Stage
 from frames.director import Director
-from frames.entity import Entity
+from frames.entity import Entity, StateWrapper
 from frames.behaviour import Behaviour
-from frames.boxes import Box, collide
+from frames.animation import Animated, load_clips
+from frames.boxes import Box, bounding, collide_masks
+from frames.contacts import END
+from frames.events import DIED
+from frames.tilemap import Tilemap
+from frames.segments import (SegmentTree, segments_from_boxes, platform,
+                             UP, DOWN, LEFT, RIGHT)
 
 from assets import QAssets
 from qengine import QEngine
@@ -68,38 +78,78 @@ class Environment(Entity):
 
 
 class GetCollected(Behaviour):
-    """GetCollected(cls) -> a Behaviour which kills it's Entity one physics
-    step after colliding with any entity of type cls
+    """GetCollected(cls[, precise]) -> a Behaviour which kills it's Entity one
+    physics step after colliding with any entity of type cls
+
+    Relies on the Stage watching contacts between its Entity and cls.
+
+    When precise, boxes that collide are also checked against the sprites'
+    masks, if the Stage has any.
     """
 
-    def __init__(self, cls):
+    def __init__(self, cls, precise=False):
 
         self.__cls = cls
+        self.__precise = precise
+
+        self.__touched = False
+
+    def touches(self, stage, curr, entity):
+        """GC.touches(stage, curr, entity) -> bool
+
+        Narrow phase check, only to be done after the boxes collided.
+        """
+
+        if not self.__precise:
+
+            return True
+
+        # The frames shown, as clips play
+        mask = stage.mask(*StateWrapper(curr).shown())
+        other_mask = stage.mask(*entity.present().shown())
+
+        if mask is None or other_mask is None:
+
+            return True
+
+        return collide_masks(curr.r_box, mask,
+                             entity.present().r_box(), other_mask)
 
     def prepare(self, prev, curr, next):
         pass
 
+    def contact(self, kind, other, stage, prev, curr, next):
+
+        if kind != END and isinstance(other, self.__cls) and\
+                self.touches(stage, curr, other):
+
+            self.__touched = True
+
     def decide(self, dt, event, stage, hint, prev, curr, next):
 
-        if curr.dead:
+        if curr.dead or self.__touched:
 
             next.dead = True
 
-        for entity in stage:
-
-            if isinstance(entity, self.__cls) and\
-                    collide(curr.b_box, entity.present().b_box()):
 
-                next.dead = True
+# The order in which JumpNRun handles segments facing each way
+SEGMENT_ORDER = {UP: 0, LEFT: 1, RIGHT: 1, DOWN: 2}
 
 
 class JumpNRun(Behaviour):
+    """JumpNRun(g, a_jump, a_run, a_fall, drag, friction[, starts_on_ground[,
+    jump_time]]) -> a Behaviour for the player's character
+
+    A jump pushes with a_jump for jump_time milliseconds, whatever the
+    length of the physics step, so jumps are as high at any timestep.
+    """
 
     def __init__(self, g, a_jump, a_run, a_fall, drag, friction,
-                 starts_on_ground=False):
+                 starts_on_ground=False, jump_time=1000.0 / 60):
 
         self.__g = g
         self.__a_jump = a_jump
+        self.__jump_time = jump_time
         self.__a_run = a_run
         self.__a_fall = a_fall
 
@@ -173,7 +223,7 @@ class JumpNRun(Behaviour):
 
         if event.jump_pressed() and self.__on_ground:
 
-            vy += a_jump * dt
+            vy += a_jump * self.__jump_time
 
             self.__on_ground = False
 
@@ -259,6 +309,69 @@ class JumpNRun(Behaviour):
 
         self.__v = (vx, vy)
 
+    def handle_collisions(self, dt, obox, box):
+        """JNR.handle_collisions(dt, obox, box)
+
+        Keep the character from going through the obstacle.
+        """
+
+        self.handle_ground_collision(dt, obox, box)
+
+        self.handle_wall_collision(dt, obox, box)
+
+        self.handle_ceiling_collision(dt, obox, box)
+
+    def handle_segment_collision(self, dt, segment, box):
+        """JNR.handle_segment_collision(dt, segment, box)
+
+        Keep the character from crossing the segment from the side it faces.
+        Touching the very end of a segment doesn't count, so that the
+        character doesn't catch on corners.
+        """
+
+        vx, vy = self.__v
+
+        dx = vx * dt
+        dy = vy * dt
+
+        x_matches = (box.x + dx < segment.x1 and
+                     segment.x0 < box.x + box.w + dx)
+
+        y_matches = (box.y + dy < segment.y1 and
+                     segment.y0 < box.y + box.h + dy)
+
+        if segment.normal == UP:
+
+            if box.y + dy <= segment.y0 <= box.y and x_matches:
+
+                dy = segment.y0 - box.y
+
+                self.__on_ground = True
+
+        elif segment.normal == DOWN:
+
+            head = box.y + box.h
+
+            if head <= segment.y0 <= head + dy and x_matches:
+
+                dy = min(dy, segment.y0 - head)
+
+        elif segment.normal == LEFT:
+
+            right = box.x + box.w
+
+            if right <= segment.x0 <= right + dx and y_matches:
+
+                dx = segment.x0 - right
+
+        else:
+
+            if box.x + dx <= segment.x0 <= box.x and y_matches:
+
+                dx = segment.x0 - box.x
+
+        self.__v = (dx / dt, dy / dt)
+
     def move(self, dx, dy, curr, next):
         """JNR.move(dx, dy, curr, next)
 
@@ -283,17 +396,40 @@ class JumpNRun(Behaviour):
         # Handle collisions
         self.__on_ground = False
 
-        for entity in stage:
+        # Obstacles only need to be looked up around the path of the character
+        box = curr.b_box
+
+        vx, vy = self.__v
+
+        area = bounding(box, Box(box.x + vx * dt, box.y + vy * dt,
+                                 box.w, box.h))
+
+        segments = stage.segments()
+
+        if segments is None:
+
+            for entity in stage:
+
+                if isinstance(entity, Environment) and entity.is_obstacle():
+
+                    obox = entity.present().b_box()
+
+                    self.handle_collisions(dt, obox, box)
 
-            if isinstance(entity, Environment) and entity.is_obstacle():
+        else:
+
+            # Floors first, then walls, then ceilings -- like with boxes
+            for segment in sorted(segments.query(area),
+                                  key=lambda segment: SEGMENT_ORDER[
+                                      segment.normal]):
 
-                obox = entity.present().b_box()
+                self.handle_segment_collision(dt, segment, box)
 
-                self.handle_ground_collision(dt, obox, curr.b_box)
+        for tilemap in stage.tilemaps():
 
-                self.handle_wall_collision(dt, obox, curr.b_box)
+            for obox in tilemap.solid_boxes(area):
 
-                self.handle_ceiling_collision(dt, obox, curr.b_box)
+                self.handle_collisions(dt, obox, box)
 
         # Move the character
         vx, vy = self.__v
@@ -318,29 +454,45 @@ class Psi(Entity):
 
 
 class Star(Entity):
-    """Star(x, y) -> a collectible star"""
+    """Star(x, y[, clips]) -> a collectible star
 
-    def __init__(self, x, y):
+    Given a ClipLibrary with a `star_twinkle` clip, it twinkles.
+    """
+
+    def __init__(self, x, y, clips=None):
+
+        behaviour = GetCollected(Psi, precise=True)
+
+        if clips is not None:
+
+            behaviour = Animated(behaviour, clips, {'star': 'star_twinkle'})
 
         super(Star, self).__init__(
             (x, y),
-            (63, 63),
+            (60, 60),
             (60, 60),
             "star",
-            GetCollected(Psi))
+            behaviour)
 
 
 class MoveOverPath(Behaviour):
-    """MoveOverPath(speed, points) -> a Behaviour for objects following a path
-    and moving with a constant speed
+    """MoveOverPath(speed, points[, die_after[, tiers]]) -> a Behaviour for
+    objects following a path and moving with a constant speed
+
+    Each axis moves at the speed until it reaches the next point, so that
+    one step of dt*k takes it just as far as k steps of dt. Away from the
+    viewport it is updated less often, as given by the tiers (see
+    Behaviour.tiers), and then walks the path in one go.
     """
 
-    def __init__(self, speed, points, die_after=None):
+    def __init__(self, speed, points, die_after=None,
+                 tiers=((256, 4), (1024, 16))):
 
         self.__speed = speed
         self.__points = points
         self.__heading_to = 0
         self.__die_after = die_after
+        self.__tiers = tiers
 
     def prepare(self, prev, curr, next):
 
@@ -353,38 +505,95 @@ class MoveOverPath(Behaviour):
     def decide(self, dt, events, stage, hint, prev, curr, next):
 
         # Calculate the next position
+        x, y = self.__walk(curr.b_box.x, curr.b_box.y, dt)
+
+        next.b_box.move_to(x, y)
+        next.r_box.move_to(x, y)
+
+        # Die if an aproriate amount of steps has passed
+        if curr.passed is not None:
+
+            if curr.passed == 0:
+                next.dead = True
+
+            else:
+                next.passed = curr.passed - 1
+
+    def tiers(self):
+
+        return self.__tiers
+
+    def __lap(self, points):
+
+        # How long it takes to go round the whole path
+        return sum(max(abs(p - x), abs(q - y))
+                   for (x, y), (p, q) in zip(points[-1:] + points[:-1],
+                                             points)) / float(self.__speed)
+
+    def __walk(self, x, y, time):
+
         s = self.__speed
-        x, y = curr.b_box.x, curr.b_box.y
-        p, q = self.__points[self.__heading_to]
+        points = list(self.__points)
 
-        v_x = s * math.copysign(1, p - x)
-        v_y = s * math.copysign(1, q - y)
+        left = time if s > 0 else 0
 
-        x += dt * v_x
-        y += dt * v_y
+        # Follow the path from point to point, rather than overshoot them
+        while left > 0:
 
-        next.b_box.move_to(x, y)
-        next.r_box.move_to(x, y)
+            p, q = points[self.__heading_to]
 
-        # Turn, if close enough to the current crosshair point
-        if abs(x - p) <= s * dt and abs(y - q) <= s * dt:
+            t = max(abs(p - x), abs(q - y)) / float(s)
 
-            if self.__heading_to + 1 < len(self.__points):
+            if t > left:
 
-                self.__heading_to += 1
+                x += math.copysign(min(abs(p - x), s * left), p - x)
+                y += math.copysign(min(abs(q - y), s * left), q - y)
 
-            else:
+                break
 
-                self.__heading_to = 0
+            x, y, left = p, q, left - t
+
+            self.__heading_to = (self.__heading_to + 1) % len(points)
+
+            # Skip whole laps
+            if self.__heading_to == 0:
+
+                lap = self.__lap(points)
+
+                if lap <= 0:
+
+                    break
+
+                left %= lap
+
+        return x, y
+
+    def advance(self, dt, steps, event, stage, hint, prev, curr, next):
+
+        x, y = self.__walk(curr.b_box.x, curr.b_box.y, dt * steps)
+
+        next.b_box.move_to(x, y)
+        next.r_box.move_to(x, y)
 
-        # Die if an aproriate amount of steps has passed
         if curr.passed is not None:
 
-            if curr.passed == 0:
+            if curr.passed < steps:
                 next.dead = True
 
             else:
-                next.passed = curr.passed - 1
+                next.passed = curr.passed - steps
+
+
+# What level files can be made of
+ENTITY_TYPES = dict(entity=Entity,
+                    environment=Environment,
+                    psi=Psi,
+                    star=Star,
+                    tilemap=Tilemap)
+
+BEHAVIOUR_TYPES = dict(do_nothing=DoNothing,
+                       jump_n_run=JumpNRun,
+                       move_over_path=MoveOverPath)
 
 
 class DumbDirector(Director):
@@ -431,29 +640,22 @@ class DumbDirector(Director):
 
         stage.add_spawn(win_message, 'overlay')
 
-    def handle_star_collection(self, event, stage, levels):
-        """DD.handle_star_collection(event, stage, levels)
-
-        Deals with the collection of a star and game restarting.
-        """
+    def tell_events(self, stage, events):
 
+        # Subscribed only to the death of the star
         if not self.__collected:
 
-            collected = True
-
-            for entity in stage:
-
-                if entity is self.__star:
-
-                    collected = False
+            self.__collected = True
 
-            self.__collected = collected
+            self.show_win_message(stage)
 
-            if collected:
+    def handle_star_collection(self, event, stage, levels):
+        """DD.handle_star_collection(event, stage, levels)
 
-                    self.show_win_message(stage)
+        Deals with game restarting once the star is collected.
+        """
 
-        else:
+        if self.__collected:
 
             if event.jump_pressed():
 
@@ -473,82 +675,90 @@ class DumbDirector(Director):
 
         self.handle_star_collection(event, stage, levels)
 
-    def viewport(self, stage):
+    def viewport(self, stage, alpha=1):
 
         return self.__box
 
 
 class DumbLevel(Level):
-    """DumbLevel() -> a dumb Level
+    """DumbLevel([path[, clip_path]]) -> a dumb Level
 
     It is empty and will end only on a QUIT event, and end the game
     alltogether.
+
+    The Entities come from a level file, levels/dumb.yaml by default. The
+    file may also list one-way `platforms` as [x, y, width] triples.
+
+    Animation clips come from assets/clips.yaml by default, see load_clips.
     """
 
-    def __init__(self):
+    def __init__(self, path=None, clip_path=None):
 
-        # Get a cam and a stage
-        stage = Stage((800, 600), ['bg', 'movers', 'overlay'], 'movers')
+        if path is None:
 
-        star = Star(710, 30)
+            path = os.path.join(
+                os.path.dirname(os.path.abspath(__file__)),
+                '..',
+                'levels',
+                'dumb.yaml')
 
-        # Spawn the entities
-        stage.add_spawn(Environment(30, 30,
-                                    (740, 540),
-                                    'bg'),
-                        'bg')
+        if clip_path is None:
 
-        stage.add_spawn(Environment(0, 0,
-                                    (800, 30),
-                                    'h_bar', True),
-                        'bg')
+            clip_path = os.path.join(
+                os.path.dirname(os.path.abspath(__file__)),
+                '..',
+                'assets',
+                'clips.yaml')
 
-        stage.add_spawn(Environment(0, 570,
-                                    (800, 30),
-                                    'h_bar', True),
-                        'bg')
+        clips = load_clips(clip_path)
 
-        stage.add_spawn(Environment(0, 30,
-                                    (30, 540),
-                                    'v_bar', True),
-                        'bg')
+        entity_types = dict(ENTITY_TYPES,
+                            star=functools.partial(Star, clips=clips))
 
-        stage.add_spawn(Environment(770, 30,
-                                    (30, 540),
-                                    'v_bar', True),
-                        'bg')
+        # Get a stage with everything spawned
+        data = load_level_data(path)
 
-        stage.add_spawn(Environment(370, 30,
-                                    (60, 60),
-                                    'sqr', True),
-                        'bg')
+        stage, named = build_stage(data, entity_types, BEHAVIOUR_TYPES)
 
-        stage.add_spawn(Environment(30, 30,
-                                    (60, 60),
-                                    'sqr', True),
-                        'bg')
+        # Outline the obstacles, adding the one-way platforms
+        obstacles = [entity.present().b_box()
+                     for entity in stage
+                     if isinstance(entity, Environment) and
+                     entity.is_obstacle()]
 
-        stage.add_spawn(Environment(30, 150,
-                                    (60, 60),
-                                    'sqr', True),
-                        'bg')
+        segments = segments_from_boxes(obstacles)
 
-        stage.add_spawn(star)
+        for x, y, w in data.get('platforms', ()):
 
-        stage.add_spawn(Psi(35, 100))
+            segments.append(platform(x, y, w))
 
-        stage.spawn()
+        stage.set_segments(SegmentTree(segments))
+
+        stage.watch_contacts(Star, Psi)
+
+        w, h = stage.size
+
+        director = DumbDirector(Box(0, 0, w, h), named['star'])
+
+        stage.subscribe(director, [DIED], entity=named['star'])
 
         # Call the superclasses initialiser
-        super(DumbLevel, self).__init__(
-            DumbDirector(Box(0, 0, 800, 600), star),
-            stage)
+        super(DumbLevel, self).__init__(director, stage)
+
+    def sprite_names(self):
+
+        # The win message is spawned later on
+        return super(DumbLevel, self).sprite_names() | set(['win_screen'])
 
 
 class QuanteeTheGame(Game):
-    """QuanteeTheGame(fullscreen) -> our game"""
+    """QuanteeTheGame(fullscreen[, watch_assets[, resolution]]) -> our game
+
+    With a resolution given, the 800x600 game is scaled to a window of that
+    size.
+    """
 
-    def __init__(self, fullscreen):
+    def __init__(self, fullscreen, watch_assets=False, resolution=None):
 
         asset_path = os.path.join(
             os.path.dirname(os.path.abspath(__file__)),
@@ -557,12 +767,18 @@ class QuanteeTheGame(Game):
 
         color_key = (255, 0, 255)
 
+        logical_size = (800, 600)
+
+        max_fps = 32
+
         sdl = QEngine("Quantee",
-                      (800, 600),
+                      resolution or logical_size,
                       color_key,
-                      QAssets(color_key, asset_path),
-                      max_fps=32,
-                      fullscreen=fullscreen)
+                      QAssets(color_key, asset_path,
+                              watch=watch_assets),
+                      max_fps=max_fps,
+                      fullscreen=fullscreen,
+                      logical_size=logical_size if resolution else None)
 
         strategy = DirtyWholes()
 
@@ -571,7 +787,12 @@ class QuanteeTheGame(Game):
         super(QuanteeTheGame, self).__init__(
             sdl,
             strategy,
-            init_level)
+            init_level,
+            interpolate=True,
+            governor=Governor(1000.0 / max_fps,
+                              [Interpolation(), OffscreenUpdates(),
+                               Timestep()]),
+            collector=Collector())
 
 
 if __name__ == '__main__':
@@ -594,6 +815,20 @@ if __name__ == '__main__':
         const=True,
         default=False)
 
+    parser.add_argument(
+        '-W', '--watch-assets',
+        dest='watch_assets',
+        action='store_const',
+        const=True,
+        default=False)
+
+    parser.add_argument(
+        '-R', '--resolution',
+        dest='resolution',
+        type=lambda text: tuple(int(side) for side in text.split('x')),
+        default=None,
+        help='window size as WIDTHxHEIGHT')
+
     args = parser.parse_args()
 
     # Logging configuration
@@ -616,5 +851,5 @@ if __name__ == '__main__':
     logging.config.dictConfig(log_config)
 
     # Game startup
-    game = QuanteeTheGame(args.fullscreen)
+    game = QuanteeTheGame(args.fullscreen, args.watch_assets, args.resolution)
     game.run()
@@ -17,12 +17,15 @@
 # You should have received a copy of the GNU General Public License
 # along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
 
+import math
 
 import pygame
 
 from frames.boxes import Box
 from frames.engine import Engine, Options
 
+from pacer import FramePacer
+
 __all__ = ['SDL']
 
 
@@ -36,10 +39,13 @@ class Internal(object):
     without giving either public methods to do so.
     """
 
-    def __init__(self, fullscreen):
+    def __init__(self, fullscreen, scaled=False):
 
         self.__fullscreen = fullscreen
 
+        self.__scaled = scaled
+        self.__full_update = False
+
     def fullscreen(self):
         """I.fullscreen() -> bool
 
@@ -57,6 +63,36 @@ class Internal(object):
 
         self.__fullscreen = yes
 
+    def scaled(self):
+        """I.scaled() -> bool
+
+        Tells whether the engine draws to a logical framebuffer scaled to the
+        window.
+        """
+
+        return self.__scaled
+
+    def request_full_update(self):
+        """I.request_full_update()
+
+        Asks the engine to bring the whole window up to date with the logical
+        framebuffer, eg. after the window was resized.
+        """
+
+        self.__full_update = True
+
+    def take_full_update(self):
+        """I.take_full_update() -> bool
+
+        Tells whether a full update was requested since the last call.
+        """
+
+        did_it = self.__full_update
+
+        self.__full_update = False
+
+        return did_it
+
 
 class Options(Options):
     """Options(engine) -> a new Options object for the SDL engine"""
@@ -89,7 +125,7 @@ class Options(Options):
 
     def resolution(self):
 
-        return self.__engine.screen_size()
+        return self.__engine.window_size()
 
     def set_resolution(self, width, height):
 
@@ -98,7 +134,7 @@ class Options(Options):
     def confirm(self):
 
         fullscreen = self.__engine.fullscreen()
-        res = self.__engine.screen_size()
+        res = self.__engine.window_size()
 
         call_set_mode = False
 
@@ -119,7 +155,16 @@ class Options(Options):
                 pygame.FULLSCREEN if fullscreen else 0)
 
             self.__internals.set_fullscreen(fullscreen)
-            self.__screen_changed = True
+
+            # A logical framebuffer survives the change, it only has to be
+            # scaled to the new window
+            if self.__internals.scaled():
+
+                self.__internals.request_full_update()
+
+            else:
+
+                self.__screen_changed = True
 
     def cancel(self):
 
@@ -129,7 +174,8 @@ class Options(Options):
 
 class SDL(Engine):
     """SDL(title, (width, height), color_key, asset_manager[, fullscreen[,
-    max_fps[, use_busy_loop[, allowed_events]]]]) -> the Engine
+    max_fps[, use_busy_loop[, allowed_events[, logical_size[,
+    use_pacer]]]]]]) -> the Engine
 
     Engine based on the PyGame binding to the SDL library.
 
@@ -142,15 +188,27 @@ class SDL(Engine):
         CPU cycles and is more precise. The second is a smaller strain on the
         machine but less precise.
 
-        Defaults to False.
+        Defaults to False. Ignored when `use_pacer` is set.
+
+      * `use_pacer` sets whether to wait with a FramePacer instead, sleeping
+        most of the time and looping only for the last moment. It is about as
+        precise as the busy loop and about as cheap as sleeping. Defaults to
+        True.
 
       * `allowed_events` is a list of PyGame event types that shouldn't be
         ommited. Defaults to [pygame.QUIT, pygame.KEYDOWN, pygame.KEYUP]
+
+      * `logical_size` is the (width, height) of an offscreen framebuffer
+        everything gets drawn to. It is then scaled to the window, only where
+        something was drawn. When the window is an integer multiple of it the
+        scaling just repeats pixels. Defaults to None, meaning drawing
+        directly to the window.
     """
 
     def __init__(self, title, screen_size, color_key, asset_manager,
                  fullscreen=False, max_fps=32, use_busy_loop=False,
-                 allowed_events=[pygame.QUIT, pygame.KEYDOWN, pygame.KEYUP]):
+                 allowed_events=[pygame.QUIT, pygame.KEYDOWN, pygame.KEYUP],
+                 logical_size=None, use_pacer=True):
 
         # Prerequisite initialisation
         super(SDL, self).__init__()
@@ -158,7 +216,7 @@ class SDL(Engine):
         pygame.init()
 
         # Prepare the options object
-        self.__internals = Internal(fullscreen)
+        self.__internals = Internal(fullscreen, logical_size is not None)
         self.__opt = Options(self, self.__internals)
 
         # Prepare the asset manager
@@ -169,7 +227,14 @@ class SDL(Engine):
             screen_size,
             pygame.FULLSCREEN if fullscreen else 0)
 
-        self.__screen = pygame.display.get_surface()
+        if logical_size is None:
+
+            self.__screen = pygame.display.get_surface()
+
+        else:
+
+            self.__screen = pygame.Surface(logical_size).convert()
+
         self.__screen.set_colorkey(color_key)
 
         pygame.display.set_caption(title)
@@ -184,12 +249,17 @@ class SDL(Engine):
         self.__clock = pygame.time.Clock()
         self.__max_fps = max_fps
         self.__use_busy_loop = use_busy_loop
+        self.__pacer = FramePacer(max_fps) if use_pacer else None
 
     # Input and time
     def dt(self):
         """SDL.dt() -> time it took to render the last frame"""
 
-        if self.__use_busy_loop:
+        if self.__pacer is not None:
+
+            dt = self.__pacer.tick()
+
+        elif self.__use_busy_loop:
 
             dt = self.__clock.tick_busy_loop(self.__max_fps)
 
@@ -199,6 +269,18 @@ class SDL(Engine):
 
         return dt
 
+    def time_left(self):
+        """SDL.time_left() -> milliseconds or None
+
+        Known only when a FramePacer keeps the frame rate.
+        """
+
+        if self.__pacer is None:
+
+            return None
+
+        return self.__pacer.time_left() * 1000
+
     def input(self):
         """SDL.input() -> an Event or None"""
 
@@ -212,10 +294,69 @@ class SDL(Engine):
         applied on top of the display memory.
         """
 
-        if self.__blitted_boxes:
+        if self.__internals.scaled():
+
+            self.__present()
+
+        elif self.__blitted_boxes:
             pygame.display.update(self.__blitted_boxes)
             self.__blitted_boxes = []
 
+    def __present(self):
+        """SDL.__present()
+
+        Scales the parts of the logical framebuffer drawn to since the last
+        call onto the window.
+        """
+
+        window = pygame.display.get_surface()
+
+        if self.__internals.take_full_update():
+
+            boxes = [self.__screen.get_rect()]
+
+        else:
+
+            boxes = self.__blitted_boxes
+
+        self.__blitted_boxes = []
+
+        if not boxes:
+
+            return
+
+        w, h = self.__screen.get_size()
+        win_w, win_h = window.get_size()
+
+        s_x = float(win_w) / w
+        s_y = float(win_h) / h
+
+        bounds = self.__screen.get_rect()
+        updated = []
+
+        for box in boxes:
+
+            rect = pygame.Rect(box).clip(bounds)
+
+            if not rect.w or not rect.h:
+
+                continue
+
+            left = int(rect.x * s_x)
+            top = int(rect.y * s_y)
+            right = min(int(math.ceil(rect.right * s_x)), win_w)
+            bottom = min(int(math.ceil(rect.bottom * s_y)), win_h)
+
+            target = pygame.Rect(left, top, right - left, bottom - top)
+
+            pygame.transform.scale(self.__screen.subsurface(rect),
+                                   target.size,
+                                   window.subsurface(target))
+
+            updated.append(target)
+
+        pygame.display.update(updated)
+
     # Coordinate system handling
     def __to_screen_coords(self, box, scale, viewport):
         """SDL.__to_screen_coords(box, scale, viewport) -> Box
@@ -249,10 +390,18 @@ class SDL(Engine):
 
     # State
     def screen_size(self):
-        """SDL.screen_size -> (width, height)"""
+        """SDL.screen_size -> (width, height)
+
+        Size of what gets drawn to, which might differ from the window's.
+        """
 
         return self.__screen.get_size()
 
+    def window_size(self):
+        """SDL.window_size() -> (width, height)"""
+
+        return pygame.display.get_surface().get_size()
+
     def fullscreen(self):
         """SDL.fullscreen() -> bool
 
@@ -270,14 +419,14 @@ class SDL(Engine):
 
         return self.__opt
 
-    def draw(self, pos, sprite_name, viewport):
-        """SDL.draw((x, y), sprite_name, viewport)
+    def draw(self, pos, sprite_name, viewport, region=None):
+        """SDL.draw((x, y), sprite_name, viewport[, region])
 
         Draws the sprite named sprite_name at the (x, y) coordinates of the
-        window.
+        stage, as seen through the viewport Box.
 
-        The optional Box describes which subset of the sprite to draw. When not
-        specified, the whole sprite is drawn.
+        The optional (x, y, w, h) region describes which subset of the sprite
+        to draw. When not specified, the whole sprite is drawn.
 
         The coordinates are standard Cartesian. It's the Engine's job to
         transform them to the underlying coordinate system used by the
@@ -287,17 +436,22 @@ class SDL(Engine):
         # Get the sprite
         sprite = self.__asset_manager.load_sprite(sprite_name)
 
+        if region is None:
+
+            w, h = sprite.get_size()
+
+        else:
+
+            w, h = region[2], region[3]
+
         # Recalculate the coordinates
         x, y = pos
-        coords = self.__to_screen_coords(Box(x,
-                                             y,
-                                             sprite.get_width(),
-                                             sprite.get_height()),
+        coords = self.__to_screen_coords(Box(x, y, w, h),
                                          SCALE,
                                          viewport)
 
         # Blit to self.__screen
-        self.__screen.blit(sprite, (coords.x, coords.y))
+        self.__screen.blit(sprite, (coords.x, coords.y), region)
 
         # Remember which box was blitted
         self.__blitted_boxes.append((coords.x,
@@ -305,6 +459,50 @@ class SDL(Engine):
                                      coords.w,
                                      coords.h))
 
+    def scroll(self, dx, dy):
+        """SDL.scroll(dx, dy)
+
+        Shifts the screen buffer in place by the opposite of the viewport's
+        movement (dx, dy). The stage's y axis points up, while the screen's
+        points down.
+        """
+
+        self.__screen.scroll(int(-dx * SCALE), int(dy * SCALE))
+
+        # All of the screen changed
+        w, h = self.__screen.get_size()
+
+        self.__blitted_boxes.append((0, 0, w, h))
+
+    def preload(self, sprite_names):
+        """SDL.preload(sprite_names)
+
+        Has the asset manager load the named sprites ahead of time.
+        """
+
+        self.__asset_manager.preload(sprite_names)
+
+    def load_mask(self, sprite_name, region=None):
+        """SDL.load_mask(sprite_name[, region]) -> a pygame.mask.Mask"""
+
+        return self.__asset_manager.load_mask(sprite_name, region)
+
+    def changed_sprites(self):
+        """SDL.changed_sprites() -> set of sprite names
+
+        Has the asset manager reload the sprites that changed on disk.
+        """
+
+        return self.__asset_manager.reload_changed()
+
+    def close(self):
+        """SDL.close()
+
+        Has the asset manager let go of its files.
+        """
+
+        self.__asset_manager.close()
+
 
 class AssetManager(object):
     """Abstract base class for AssetManagers."""
@@ -317,6 +515,35 @@ class AssetManager(object):
 
         raise NotImplementedError()
 
+    def load_mask(self, name, region=None):
+        """AM.load_mask(name[, region]) -> a pygame.mask.Mask
+
+        Make a collision mask out of the opaque pixels of a sprite, or of the
+        (x, y, w, h) region of it, cached as long as the sprite is.
+        """
+
+        raise NotImplementedError()
+
+    def preload(self, names):
+        """AM.preload(names)
+
+        Load up the named sprites ahead of their first use. The default
+        implementation loads them one after another.
+        """
+
+        for name in names:
+
+            self.load_sprite(name)
+
+    def reload_changed(self):
+        """AM.reload_changed() -> set of sprite names
+
+        Reload the sprites whose files changed and tell which ones they were.
+        The default implementation doesn't notice any changes.
+        """
+
+        return set()
+
     def clear_cache(self):
         """AM.clear_cache()
 
@@ -324,3 +551,12 @@ class AssetManager(object):
         """
 
         raise NotImplementedError()
+
+    def close(self):
+        """AM.close()
+
+        Let go of open files and the like. Sprites must not be used afterwards.
+        The default implementation does nothing.
+        """
+
+        pass
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+
+# Copyright 2012-2013 Karol Marcjan and Bartosz Boguniewicz
+#
+# This file is part of Quantee.
+#
+# Foobar is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Foobar is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Foobar.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import sys
+import time
+import errno
+import struct
+import logging
+
+__all__ = ['Watcher', 'InotifyWatcher', 'PollingWatcher', 'watch']
+
+
+logger = logging.getLogger(__name__)
+
+logger.addHandler(logging.NullHandler())
+
+
+class Watcher(object):
+    """Abstract base class for directory watchers."""
+
+    def changes(self):
+        """W.changes() -> set of file names
+
+        Names of the files in the watched directory that were created or
+        modified since the last call. Never blocks.
+        """
+
+        raise NotImplementedError()
+
+    def close(self):
+        """W.close()
+
+        Stop watching.
+        """
+
+        pass
+
+
+class InotifyWatcher(Watcher):
+    """InotifyWatcher(directory) -> a Watcher
+
+    Watcher using the Linux inotify API through ctypes. Raises OSError when
+    inotify is not available.
+    """
+
+    IN_CLOSE_WRITE = 0x08
+    IN_MOVED_TO = 0x80
+
+    EVENT = struct.Struct('iIII')
+
+    def __init__(self, directory):
+
+        import ctypes
+        import ctypes.util
+
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+
+        self.__fd = libc.inotify_init1(os.O_NONBLOCK)
+
+        if self.__fd < 0:
+
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+
+        # Only files done being written, or moved in whole
+        mask = self.IN_CLOSE_WRITE | self.IN_MOVED_TO
+
+        watch = libc.inotify_add_watch(self.__fd, directory.encode(), mask)
+
+        if watch < 0:
+
+            os.close(self.__fd)
+
+            raise OSError(ctypes.get_errno(), 'inotify_add_watch failed')
+
+        logger.info('Watching %s with inotify', directory)
+
+    def changes(self):
+
+        changed = set()
+
+        while True:
+
+            try:
+
+                data = os.read(self.__fd, 4096)
+
+            except OSError as error:
+
+                if error.errno == errno.EAGAIN:
+
+                    break
+
+                raise
+
+            offset = 0
+
+            while offset < len(data):
+
+                _, _, _, length = self.EVENT.unpack_from(data, offset)
+
+                offset += self.EVENT.size
+
+                name = data[offset:offset + length].rstrip(b'\0')
+
+                offset += length
+
+                if name:
+
+                    changed.add(name.decode())
+
+        return changed
+
+    def close(self):
+
+        os.close(self.__fd)
+
+
+class PollingWatcher(Watcher):
+    """PollingWatcher(directory[, interval]) -> a Watcher
+
+    Watcher comparing modification times of the files, at most once every
+    interval seconds (0.5 by default).
+    """
+
+    def __init__(self, directory, interval=0.5):
+
+        self.__directory = directory
+        self.__interval = interval
+
+        self.__last_poll = time.time()
+        self.__mtimes = self.__scan()
+
+        logger.info('Watching %s by polling', directory)
+
+    def __scan(self):
+
+        mtimes = {}
+
+        for name in os.listdir(self.__directory):
+
+            try:
+
+                mtimes[name] = os.stat(
+                    os.path.join(self.__directory, name)).st_mtime
+
+            except OSError:
+
+                pass
+
+        return mtimes
+
+    def changes(self):
+
+        now = time.time()
+
+        if now - self.__last_poll < self.__interval:
+
+            return set()
+
+        self.__last_poll = now
+
+        mtimes = self.__scan()
+
+        changed = set(name
+                      for name, mtime in mtimes.items()
+                      if self.__mtimes.get(name) != mtime)
+
+        self.__mtimes = mtimes
+
+        return changed
+
+
+def watch(directory):
+    """watch(directory) -> a Watcher
+
+    Watches the directory with inotify when possible, falling back to polling
+    otherwise.
+    """
+
+    if sys.platform.startswith('linux'):
+
+        try:
+
+            return InotifyWatcher(directory)
+
+        except (OSError, AttributeError) as error:
+
+            logger.warning('No inotify (%s), falling back to polling', error)
+
+    return PollingWatcher(directory)